@@ -0,0 +1,72 @@
+# benchmarks/bench_boundary_load.py
+#
+# Load time and memory of the boundary layers as shapefiles (gpd.read_file,
+# then to_crs for Web Mercator) against the memory-mapped Arrow IPC copies
+# written by `python -m utils.build_data convert`. Each case runs in a fresh
+# interpreter so nothing is shared with the parent or a previous case.
+# Anonymous memory is what each additional Streamlit worker would add; the
+# rest of RSS is file-backed pages shared through the OS cache.
+#
+#   python -m benchmarks.bench_boundary_load [--layer districts]
+
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD = r"""
+import json, sys, time
+import geopandas as gpd
+from utils.boundary_store import CONVERTED_CRS, GEOGRAPHIC_CRS, converted_path, read_arrow
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields.get("Rss", 0), fields.get("Anonymous", 0)
+
+mode, path = sys.argv[1], sys.argv[2]
+rss0, anon0 = memory_kb()
+start = time.perf_counter()
+frames = []
+if mode == "shapefile":
+    gdf = gpd.read_file(path).to_crs(GEOGRAPHIC_CRS)
+    frames = [gdf] + [gdf.to_crs(crs) for crs in CONVERTED_CRS if crs != GEOGRAPHIC_CRS]
+else:
+    frames = [read_arrow(converted_path(path, crs)) for crs in CONVERTED_CRS]
+seconds = time.perf_counter() - start
+rss1, anon1 = memory_kb()
+print(json.dumps({"seconds": seconds, "rss_mb": (rss1 - rss0) / 1024, "anon_mb": (anon1 - anon0) / 1024,
+                  "rows": len(frames[0])}))
+"""
+
+
+def measure(mode, path):
+    out = subprocess.run([sys.executable, "-c", CHILD, mode, path], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    from utils.boundary_store import DISTRICT_SHAPEFILE_PATH, STATE_SHAPEFILE_PATH
+
+    layers = {"states": STATE_SHAPEFILE_PATH, "districts": DISTRICT_SHAPEFILE_PATH}
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--layer", choices=["all"] + list(layers), default="all")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    names = list(layers) if args.layer == "all" else [args.layer]
+    print(f"{'layer':10} {'source':10} {'rows':>6} {'load s':>8} {'+RSS MB':>9} {'+anon MB':>9}")
+    for name in names:
+        for mode in ("shapefile", "arrow"):
+            runs = [measure(mode, layers[name]) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r["seconds"])
+            print(f"{name:10} {mode:10} {best['rows']:>6} {best['seconds']:>8.3f} "
+                  f"{best['rss_mb']:>9.1f} {best['anon_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_parse_latlon.py
+#
+# Compares the row-wise `parse_latlon` apply with `parse_latlon_series` on a
+# column of mixed-format coordinate cells. By default every cell is text, as
+# `pd.read_csv` delivers it; --mixed keeps a sixth of the cells as floats, as
+# an Excel sheet with hand-typed DMS rows would.
+#
+#   python -m benchmarks.bench_parse_latlon --rows 1000000 [--mixed]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.coords import parse_latlon, parse_latlon_series
+
+
+def make_cells(rows, mixed=False, seed=0):
+    rng = np.random.default_rng(seed)
+    deg = rng.uniform(-89, 89, rows)
+    a = np.abs(deg)
+    d = a.astype(int)
+    m = (a - d) * 60
+    sec = (m - m.astype(int)) * 60
+    hemi = np.where(deg < 0, "S", "N")
+    kind = rng.integers(0, 6, rows)
+
+    cells = np.empty(rows, dtype=object)
+    sel = kind == 0
+    cells[sel] = deg[sel] if mixed else np.char.mod("%.6f", deg[sel])
+    sel = kind == 1
+    cells[sel] = np.char.mod("%.5f", deg[sel])
+    sel = kind == 2
+    cells[sel] = np.char.add(np.char.mod("%.5f", a[sel]), hemi[sel])
+    sel = kind == 3
+    cells[sel] = [f"{x}°{y}'{z:.1f}\"{h}" for x, y, z, h in zip(d[sel], m[sel].astype(int), sec[sel], hemi[sel])]
+    sel = kind == 4
+    cells[sel] = [f"{x}°{y:.3f}'{h}" for x, y, h in zip(d[sel], m[sel], hemi[sel])]
+    sel = kind == 5
+    cells[sel] = [f"{x}:{y}:{z:.0f}{h}" for x, y, z, h in zip(d[sel], m[sel].astype(int), sec[sel], hemi[sel])]
+    return pd.Series(cells, dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mixed", action="store_true")
+    args = parser.parse_args()
+
+    cells = make_cells(args.rows, mixed=args.mixed)
+
+    start = time.perf_counter()
+    rowwise = cells.apply(parse_latlon)
+    rowwise_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized, failed = parse_latlon_series(cells)
+    vectorized_s = time.perf_counter() - start
+
+    agree = np.isclose(rowwise.to_numpy(float), vectorized.to_numpy(float), equal_nan=True)
+    print(f"rows:            {args.rows:,}")
+    print(f"apply(parse_latlon):  {rowwise_s:8.3f}s")
+    print(f"parse_latlon_series:  {vectorized_s:8.3f}s  ({rowwise_s / vectorized_s:.1f}x)")
+    print(f"failed rows:     {int(failed.sum()):,}")
+    print(f"agreement:       {agree.mean():.4%}")
+
+
+if __name__ == "__main__":
+    main()
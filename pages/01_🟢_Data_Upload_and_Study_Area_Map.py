@@ -1,152 +1,28 @@
 import streamlit as st
-import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from shapely.geometry import Point, box
-import numpy as np
-import contextily as ctx
-from matplotlib.offsetbox import OffsetImage, AnnotationBbox
-import matplotlib.image as mpimg
 import io
-from utils.geo_utils import add_map_border, add_scalebar  # Assuming these exist in your project
-
-import re
+from utils.metrics import perf_panel
+from utils.artifacts import ARTIFACT_TTL_SECONDS, get_artifact_store
+from utils.sessions import get_session_id
+from utils.boundary_store import STATE_SHAPEFILE_PATH, DISTRICT_SHAPEFILE_PATH, layer_version
+from utils.aggregate import AGGREGATE_METHODS
+from utils.ingest import detect_columns, read_header, ingest_sites
+from utils.tile_cache import BASEMAP_OPTIONS
+from utils.figures import figure_summary
+from utils.render_cache import StageCache, make_key
+from utils.study_area import (
+    project_points, study_extent, detect_admin,
+    fetch_base_raster, load_north_arrow, render_study_area, render_study_area_png,
+    PREVIEW_DPI, PREVIEW_ZOOM_ADJUST, FINAL_DPI,
+)
 
 
 # --- Form Submission Check ---
 if not st.session_state.get('form_submitted', False):
     st.error("⚠️ Please fill the basic details on the Welcome page first.")
     st.stop()
-# --- Robust latitude/longitude parser ---
-def parse_latlon(val):
-    """
-    Converts a wide range of latitude/longitude string formats to decimal degrees float.
-    Supports:
-      - Decimal degrees: 9.9732, -9.9732, 9.9732N, 76.2821E, etc.
-      - DMS: 9°58'23"N, 76°16'56"E, 9 58 23 N, 9:58:23S, etc.
-      - Degrees and decimal minutes: 9°58.383'N, 76 16.934 W, etc.
-      - Any whitespace, delimiter or symbol
-    Returns NaN if format is unrecognized.
-    """
-    if isinstance(val, (float, int)) and not isinstance(val, bool):
-        return float(val)
-    if not isinstance(val, str):
-        return np.nan
-
-    s = val.strip().replace(" ", "").replace("º", "°").replace("’", "'").replace("”", '"').replace("′", "'").replace("″", '"')
-
-    # Decimal degrees with direction (e.g., 9.9732N, 76.2821W)
-    m = re.match(r"^([-+]?\d+(?:\.\d+)?)([NSEW])?$", s, re.IGNORECASE)
-    if m:
-        num = float(m.group(1))
-        direction = m.group(2)
-        if direction:
-            if direction.upper() in ['S', 'W']:
-                num = -abs(num)
-            else:
-                num = abs(num)
-        return num
-
-    # DMS or DM with possible direction: e.g., 9°58'23"N, 9:58:23N, 76°16.934'W
-    dms_pattern = (
-        r"^([-\d\.]+)[°:]([-\d\.]+)?[':]?([-\d\.]+)?\"?([NSEW])?$"
-    )
-    m = re.match(dms_pattern, s, re.IGNORECASE)
-    if m:
-        deg = float(m.group(1))
-        min_ = float(m.group(2)) if m.group(2) else 0
-        sec = float(m.group(3)) if m.group(3) else 0
-        direction = m.group(4)
-        num = abs(deg) + min_ / 60 + sec / 3600
-        if deg < 0:  # preserve negative degrees
-            num = -num
-        if direction:
-            if direction.upper() in ['S', 'W']:
-                num = -abs(num)
-            else:
-                num = abs(num)
-        return num
-
-    # Space or colon separated: "9 58 23N" or "9:58:23N"
-    m = re.match(r"^([-\d\.]+)[ :]+([-\d\.]+)(?:[ :]+([-\d\.]+))?([NSEW])?$", val.replace("º", "°"), re.IGNORECASE)
-    if m:
-        deg = float(m.group(1))
-        min_ = float(m.group(2))
-        sec = float(m.group(3)) if m.group(3) else 0
-        direction = m.group(4)
-        num = abs(deg) + min_ / 60 + sec / 3600
-        if deg < 0:
-            num = -num
-        if direction:
-            if direction.upper() in ['S', 'W']:
-                num = -abs(num)
-            else:
-                num = abs(num)
-        return num
-
-    # Single degree with direction: "9N", "76E"
-    m = re.match(r"^(\d+)([NSEW])$", s, re.IGNORECASE)
-    if m:
-        num = float(m.group(1))
-        direction = m.group(2)
-        if direction.upper() in ['S', 'W']:
-            num = -abs(num)
-        else:
-            num = abs(num)
-        return num
-
-    # Fallback: try to parse as float
-    try:
-        return float(val)
-    except Exception:
-        return np.nan
-
-# --- Column auto-detection logic ---
-def auto_detect_column(cols, keywords):
-    for key in keywords:
-        for col in cols:
-            norm_col = col.strip().lower().replace(" ", "").replace("_", "")
-            if key == norm_col:
-                return col
-    return None
-
-def auto_detect_site_column(columns, lat_col, lon_col, site_keys):
-    # 1. Try keyword-based match
-    for key in site_keys:
-        for col in columns:
-            norm_col = col.strip().lower().replace(" ", "").replace("_", "")
-            if key == norm_col:
-                return col
-    # 2. Fallback: left of lat/lon
-    try:
-        lat_idx = columns.index(lat_col)
-        if lat_idx > 0:
-            return columns[lat_idx - 1]
-    except ValueError:
-        pass
-    try:
-        lon_idx = columns.index(lon_col)
-        if lon_idx > 0:
-            return columns[lon_idx - 1]
-    except ValueError:
-        pass
-    # 3. Fallback: right of lat/lon
-    try:
-        lat_idx = columns.index(lat_col)
-        if lat_idx < len(columns) - 1:
-            return columns[lat_idx + 1]
-    except ValueError:
-        pass
-    try:
-        lon_idx = columns.index(lon_col)
-        if lon_idx < len(columns) - 1:
-            return columns[lon_idx + 1]
-    except ValueError:
-        pass
-    return None
-
 # ---- Streamlit App ----
 st.set_page_config(page_title="Data Upload & Study Area Map", page_icon="assets/br_logo.png", layout="wide")
+perf_panel()  # admins only; see utils/metrics.py
 # --- Align Help Expander to Top Right ---
 col1, col2 = st.columns([7, 3])
 with col2:
@@ -161,18 +37,24 @@ with col2:
 st.title("🟢 Data Upload & Study Area Map")
 
 
+artifacts = get_artifact_store()
+session_id = get_session_id(st.session_state)
+
+
 with st.sidebar:
     uploaded_file = st.file_uploader(
         "Upload CSV, XLS, or XLSX with Latitude & Longitude",
         type=["csv", "xls", "xlsx"]
     )
     st.markdown(
-        """
+        f"""
         <div style="border-left: 4px solid #3498db; padding-left: 1em; margin-top: 0.8em; 
                     font-size: 0.88rem; color: #444; max-height: 100px; overflow-y: auto;">
             <div style="font-size: 1.1rem; font-weight: bold;">Data Safety Disclaimer:</div>
-            This app runs entirely on Streamlit Cloud and <strong>does not store or share your uploaded study area data.</strong> 
-            All processing occurs temporarily in memory during your session and is automatically cleared when the session ends.<br>
+            This app runs entirely on Streamlit Cloud and <strong>does not keep or share your uploaded study area data.</strong> 
+            Your file is processed in memory during your session. The maps made from it may be held in memory or in a
+            temporary folder on the server while you move between pages; they are deleted shortly after your session
+            ends, and at the latest after {ARTIFACT_TTL_SECONDS / 60:.0f} minutes without use.<br>
             For more information, please refer to 
             <a href="https://streamlit.io/privacy-policy" target="_blank">Streamlit’s Data Privacy & Security Policy</a>.
         </div>
@@ -180,37 +62,20 @@ with st.sidebar:
         unsafe_allow_html=True
     )
 
-
-    state_shapefile_path = "data/India_State_Boundary_UPPERCASE.shp"
-    district_shapefile_path = "data/DISTRICT_BOUNDARY_CLEANED.shp"
-
     site_col = lat_col = lon_col = None
+    stages = st.session_state.setdefault('stages', StageCache())
+    stages.new_run()
 
     if uploaded_file:
         file_type = uploaded_file.name.split('.')[-1].lower()
-        if file_type in ['xls', 'xlsx']:
-            df = pd.read_excel(uploaded_file)
-        elif file_type == 'csv':
-            df = pd.read_csv(uploaded_file)
-        else:
+        if file_type not in ['csv', 'xls', 'xlsx']:
             st.error("Unsupported file type. Please upload a CSV, XLS, or XLSX file.")
             st.stop()
-        df.columns = df.columns.str.strip()
-        columns = df.columns.tolist()
-
-        # --- Auto-detect lat/lon columns ---
-        lat_keys = ['lat', 'latitude', 'y']
-        lon_keys = ['lon', 'lng', 'long', 'longitude', 'x']
-        site_keys = ['site', 'sitename', 'station', 'location', 'place', 'sampleid', 'name', 'point']
-
-        auto_lat = auto_detect_column(columns, lat_keys)
-        auto_lon = auto_detect_column(columns, lon_keys)
+        ingest_key = make_key(getattr(uploaded_file, "file_id", None) or uploaded_file.getvalue(), file_type)
+        columns = stages.run("header", ingest_key, read_header, uploaded_file, file_type)
 
-        # Only try to auto-detect site_col once lat/lon found
-        if auto_lat or auto_lon:
-            auto_site = auto_detect_site_column(columns, auto_lat or "", auto_lon or "", site_keys)
-        else:
-            auto_site = auto_detect_column(columns, site_keys)
+        # --- Auto-detect site/lat/lon columns ---
+        auto_site, auto_lat, auto_lon = detect_columns(columns)
 
         site_col = st.selectbox(
             "Site Name column", ["Select"] + columns,
@@ -230,10 +95,11 @@ with st.sidebar:
 
         if all(x != "Select" for x in [site_col, lat_col, lon_col]):
             # --- Apply robust lat/lon parser here! ---
-            df[lat_col] = df[lat_col].apply(parse_latlon)
-            df[lon_col] = df[lon_col].apply(parse_latlon)
-            if df[lat_col].isnull().any() or df[lon_col].isnull().any():
-                st.error("Some latitude/longitude values could not be parsed. Please check your input format.")
+            parse_key = make_key(ingest_key, [site_col, lat_col, lon_col])
+            sites, failed, bad_rows = stages.run("parse", parse_key, ingest_sites, uploaded_file, file_type, site_col, lat_col, lon_col)
+            if failed.any():
+                st.error(f"{int(failed.sum())} row(s) have latitude/longitude values that could not be parsed. Please check your input format.")
+                st.dataframe(bad_rows)
                 st.stop()
 
             st.markdown(
@@ -249,13 +115,7 @@ with st.sidebar:
 
             # --- Basemap selection ---
             with st.expander("🗺️ Basemap Style", expanded=False):
-                basemap_options = {
-                    "OpenStreetMap": ctx.providers.OpenStreetMap.Mapnik,
-                    "CartoDB Positron": ctx.providers.CartoDB.Positron,
-                    "Esri World Topo": ctx.providers.Esri.WorldTopoMap,
-                    "Esri Standard Streets": ctx.providers.Esri.WorldStreetMap
-                }
-                selected_basemap = st.selectbox("Choose a basemap", list(basemap_options.keys()))
+                selected_basemap = st.selectbox("Choose a basemap", list(BASEMAP_OPTIONS.keys()))
 
             # --- Scale bar settings ---
             with st.expander("📏 Scale Bar Settings", expanded=False):
@@ -285,6 +145,9 @@ with st.sidebar:
                 label_bg_color = "#ffffff"
                 if label_bg_enabled:
                     label_bg_color = st.color_picker("Label Background Color", "#ffffff")
+                label_thinning = st.checkbox("Hide Overlapping Labels", value=False)
+                label_max = st.number_input("Max Labels", min_value=1, max_value=10000, value=1000, step=100,
+                                            disabled=not label_thinning)
 
             # --- Marker Styling ---
             with st.expander("📍 Marker Styling", expanded=False):
@@ -301,6 +164,12 @@ with st.sidebar:
                 }
                 selected_shape_label = st.selectbox("Marker Shape", list(shape_options.keys()))
                 marker_shape = shape_options[selected_shape_label]
+                aggregate_label = st.selectbox("Aggregate Dense Points", list(AGGREGATE_METHODS.keys()),
+                                               help="Bin nearby sites into one marker sized by the number of sites")
+                aggregate = AGGREGATE_METHODS[aggregate_label]
+                aggregate_cell = 20
+                if aggregate:
+                    aggregate_cell = st.slider("Aggregation Cell Size (pt)", 5, 60, 20)
 
             # --- North Arrow Position & Size ---
             with st.expander("🧭 North Arrow Position & Size", expanded=False):
@@ -316,126 +185,97 @@ with st.sidebar:
 # --- Main Area: Map Plotting ---
 if uploaded_file and all(x != "Select" for x in [site_col, lat_col, lon_col]):
     map_placeholder = st.empty()
+    style = {
+        "basemap": selected_basemap,
+        "scalebar_unit": scalebar_unit,
+        "scalebar_length": scalebar_length,
+        "scalebar_offset_x": st.session_state.scalebar_offset_x,
+        "scalebar_offset_y": st.session_state.scalebar_offset_y,
+        "label_fontsize": label_fontsize,
+        "label_color": label_color,
+        "label_weight": label_weight,
+        "label_offset_x": label_offset_x,
+        "label_offset_y": label_offset_y,
+        "label_bg_enabled": label_bg_enabled,
+        "label_bg_color": label_bg_color,
+        "label_thinning": label_thinning,
+        "label_max": int(label_max),
+        "marker_color": marker_color,
+        "marker_size": marker_size,
+        "marker_shape": marker_shape,
+        "aggregate": aggregate,
+        "aggregate_cell": aggregate_cell,
+        "arrow_offset_x": st.session_state.arrow_offset_x,
+        "arrow_offset_y": st.session_state.arrow_offset_y,
+        "arrow_zoom": st.session_state.arrow_zoom,
+    }
     with st.spinner("Generating your map..."):
-        # 1. Prepare GeoDataFrames
-        df = df.copy()
-        gdf = gpd.GeoDataFrame(
-            df, geometry=[Point(xy) for xy in zip(df[lon_col], df[lat_col])], crs="EPSG:4326"
-        )
-        gdf_web = gdf.to_crs(epsg=3857)
-        states_gdf = gpd.read_file(state_shapefile_path).to_crs("EPSG:4326")
-        districts_gdf = gpd.read_file(district_shapefile_path).to_crs("EPSG:4326")
-
-        # Remove join index columns before spatial join
-        for col in ['index_left', 'index_right']:
-            if col in gdf.columns:
-                gdf = gdf.drop(columns=[col])
-            if col in states_gdf.columns:
-                states_gdf = states_gdf.drop(columns=[col])
-            if col in districts_gdf.columns:
-                districts_gdf = districts_gdf.drop(columns=[col])
-
-        # 2. State/District Detection
-        points_with_state = gpd.sjoin(gdf, states_gdf[['State_Name', 'geometry']], how='left', predicate='within')
-        for col in ['index_left', 'index_right']:
-            if col in points_with_state.columns:
-                points_with_state = points_with_state.drop(columns=[col])
-            if col in districts_gdf.columns:
-                districts_gdf = districts_gdf.drop(columns=[col])
-
-        points_with_district = gpd.sjoin(points_with_state, districts_gdf[['STATE', 'District', 'geometry']], how='left', predicate='within')
-
-        most_common_state = points_with_district['State_Name'].mode().iloc[0] if not points_with_district['State_Name'].isnull().all() else ""
-        unique_districts = points_with_district['District'].dropna().unique().tolist()
-        st.session_state.detected_state = most_common_state
-        st.session_state.covered_districts = unique_districts
-        district_bounds = districts_gdf[districts_gdf['District'].isin(unique_districts)].total_bounds
-        st.session_state.district_bounds_extent = district_bounds.tolist()
-        st.info(f"Detected State: **{most_common_state}**\nDetected District(s): **{', '.join(unique_districts) if unique_districts else 'None'}**")
-
-        # 3. Plot Map
-        fig, ax = plt.subplots(figsize=(10, 10), dpi=300)
-        gdf_web.plot(ax=ax, color=marker_color, edgecolor='black',
-                     markersize=marker_size, marker=marker_shape)
-        minx, miny, maxx, maxy = gdf_web.total_bounds
-        pad_x = (maxx - minx) * 0.15
-        pad_y = (maxy - miny) * 0.15
-        minx_padded, maxx_padded = minx - pad_x, maxx + pad_x
-        miny_padded, maxy_padded = miny - pad_y, maxy + pad_y
-        st.session_state['study_area_extent'] = [minx_padded, miny_padded, maxx_padded, maxy_padded]
-        ax.set_xlim(minx_padded, maxx_padded)
-        ax.set_ylim(miny_padded, maxy_padded)
-
-        # --- Add lat/lon degree axes ticks and labels ---
-        bbox_geo = gpd.GeoSeries([box(minx_padded, miny_padded, maxx_padded, maxy_padded)], crs="EPSG:3857").to_crs("EPSG:4326")
-        lon_min, lat_min, lon_max, lat_max = bbox_geo.total_bounds
-        num_ticks = 5
-        lat_ticks = np.linspace(lat_min, lat_max, num_ticks)
-        lon_ticks = np.linspace(lon_min, lon_max, num_ticks)
-        xtick_points = gpd.GeoSeries([Point(lon, lat_min) for lon in lon_ticks], crs="EPSG:4326").to_crs("EPSG:3857")
-        ytick_points = gpd.GeoSeries([Point(lon_min, lat) for lat in lat_ticks], crs="EPSG:4326").to_crs("EPSG:3857")
-       
-
-        # 1. Set bottom and left (primary axes)
-        ax.set_xticks(xtick_points.geometry.x)
-        ax.set_xticklabels([f"{lon:.2f}°E" for lon in lon_ticks], fontsize=10)
-        ax.set_yticks(ytick_points.geometry.y)
-        ax.set_yticklabels([f"{lat:.2f}°N" for lat in lat_ticks], fontsize=10)
-        ax.set_xlabel("Longitude", fontsize=12, labelpad=10)  
-        ax.set_ylabel("Latitude", fontsize=12, labelpad=10)   
-
-        # 2. Top longitude labels (keep if you want, or skip)
-        ax_top = ax.secondary_xaxis('top')
-        ax_top.set_xticks(xtick_points.geometry.x)
-        ax_top.set_xticklabels([f"{lon:.2f}°E" for lon in lon_ticks], fontsize=10)
-        
-
-        # 3. Right latitude labels (keep if you want, or skip)
-        ax_right = ax.secondary_yaxis('right')
-        ax_right.set_yticks(ytick_points.geometry.y)
-        ax_right.set_yticklabels([f"{lat:.2f}°N" for lat in lat_ticks], fontsize=10)
-        
+        lon = sites["lon"].to_numpy()
+        lat = sites["lat"].to_numpy()
 
+        # 1. Project and frame the sites
+        project_key = make_key(parse_key, "EPSG:3857")
+        x, y = stages.run("project", project_key, project_points, lon, lat)
+        extent, pad = study_extent(x, y)
 
-        # Optional: Make all tick marks point out and set size
-        ax.tick_params(axis='both', which='both', direction='out', length=6, top=True, right=True)
-        ax_top.tick_params(axis='x', direction='out', length=6)
-        ax_right.tick_params(axis='y', direction='out', length=6)
+        # 2. State/District Detection
+        admin_key = make_key(parse_key, layer_version(STATE_SHAPEFILE_PATH), layer_version(DISTRICT_SHAPEFILE_PATH))
+        admin = stages.run("admin", admin_key, detect_admin, lon, lat)
 
-        for idx, row in gdf_web.iterrows():
-            text_kwargs = dict(
-                fontsize=label_fontsize, color=label_color,
-                fontweight=label_weight, ha='left', va='bottom'
-            )
-            if label_bg_enabled:
-                text_kwargs["bbox"] = dict(facecolor=label_bg_color, edgecolor='none', boxstyle='round,pad=0.2')
-            ax.text(
-                row.geometry.x + (label_offset_x * pad_x / 100),
-                row.geometry.y + (label_offset_y * pad_y / 100),
-                str(row[site_col]), **text_kwargs
-            )
+        # 3. Basemap tiles for the extent (one zoom level coarser for the preview)
+        base_key = make_key(extent, selected_basemap, PREVIEW_ZOOM_ADJUST)
         try:
-            ctx.add_basemap(ax, source=basemap_options[selected_basemap], crs=gdf_web.crs.to_string())
+            base = stages.run("base", base_key, fetch_base_raster, extent, selected_basemap, PREVIEW_ZOOM_ADJUST)
         except Exception as e:
+            base = None
             st.warning(f"⚠️ Failed to load basemap: {e}")
 
-        add_scalebar(ax, scalebar_length, scalebar_unit, offset_x=st.session_state.scalebar_offset_x, offset_y=st.session_state.scalebar_offset_y)
         try:
-            north_arrow_path = "assets/north_arrow.png"
-            arrow_img = mpimg.imread(north_arrow_path)
-            imagebox = OffsetImage(arrow_img, zoom=st.session_state.arrow_zoom)
-            ab = AnnotationBbox(imagebox, (st.session_state.arrow_offset_x, st.session_state.arrow_offset_y), xycoords='axes fraction', frameon=False)
-            ax.add_artist(ab)
+            arrow_img = load_north_arrow()
         except Exception as e:
+            arrow_img = None
             st.warning(f"⚠️ North arrow image could not be loaded: {e}")
 
-        add_map_border(ax)
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png", dpi=300, bbox_inches='tight')
-        buf.seek(0)
+        # 4. Markers, labels, scale bar and arrow over the basemap, encoded as a screen-resolution PNG
+        labels = sites["site"].to_numpy()
+        render_key = make_key(project_key, base_key if base is not None else None, arrow_img is not None, style, PREVIEW_DPI)
+        png, hidden_labels = stages.run("render", render_key, render_study_area,
+                                        x, y, labels, extent, pad, style, base, arrow_img, dpi=PREVIEW_DPI)
+
+    # 5. Print-resolution render, only on request; reused until the inputs change
+    final_key = make_key(project_key, selected_basemap, arrow_img is not None, style, FINAL_DPI)
+    final_png = stages.peek("final", final_key)
+
+    def render_final():
+        with st.spinner(f"Rendering final map at {FINAL_DPI} dpi..."):
+            try:
+                final_base = stages.run("base", make_key(extent, selected_basemap, 0),
+                                        fetch_base_raster, extent, selected_basemap)
+            except Exception as e:
+                # Not cached: a transient tile error must not stick to the final map
+                st.warning(f"⚠️ Failed to load basemap: {e}")
+                return render_study_area_png(x, y, labels, extent, pad, style, None, arrow_img, dpi=FINAL_DPI)
+            return stages.run("final", final_key, render_study_area_png,
+                              x, y, labels, extent, pad, style, final_base, arrow_img, dpi=FINAL_DPI)
+
+    st.session_state.detected_state = admin["detected_state"]
+    st.session_state.covered_districts = admin["covered_districts"]
+    st.session_state.district_bounds_extent = admin["district_bounds_extent"]
+    st.session_state['study_area_extent'] = extent
+    # Everything needed to redraw the map as vectors for the composite (page 03)
+    st.session_state['study_area_spec'] = {
+        "x": x, "y": y, "labels": labels, "extent": extent, "pad": pad, "style": style,
+        "arrow": arrow_img is not None,
+    }
+    unique_districts = admin["covered_districts"]
+    st.info(f"Detected State: **{admin['detected_state']}**\nDetected District(s): **{', '.join(unique_districts) if unique_districts else 'None'}**")
 
     with map_placeholder.container():
-        st.pyplot(fig, use_container_width=True)
+        st.image(png, use_container_width=True)
+        if hidden_labels:
+            st.caption(f"{hidden_labels} of {len(labels)} labels hidden to avoid overlaps "
+                       f"(at most {style['label_max']} are shown). "
+                       "Turn off “Hide Overlapping Labels” under Label Styling to show them all.")
 
         # Create columns for right-alignment: [spacer, button column]
         col1, col2 = st.columns([8, 1])
@@ -448,7 +288,8 @@ if uploaded_file and all(x != "Select" for x in [site_col, lat_col, lon_col]):
                     align-items: center;
                     justify-content: flex-start;
                 }
-                .centered-download .stDownloadButton>button {
+                .centered-download .stDownloadButton>button,
+                .centered-download .stButton>button {
                     width: 48px;
                     height: 48px;
                     border-radius: 24px;
@@ -469,21 +310,33 @@ if uploaded_file and all(x != "Select" for x in [site_col, lat_col, lon_col]):
                 <div class="centered-download">
                 """, unsafe_allow_html=True)
 
-            st.download_button(
-                label="📥",
-                data=buf,
-                file_name="study_area_map.png",
-                mime="image/png",
-                use_container_width=False,  # This ensures button is only as wide as needed
-                key="download_map"
-            )
+            if final_png is None and st.button("🖨️", key="render_final", help=f"Render at {FINAL_DPI} dpi"):
+                final_png = render_final()
+            if final_png is not None:
+                st.download_button(
+                    label="📥",
+                    data=io.BytesIO(final_png),
+                    file_name="study_area_map.png",
+                    mime="image/png",
+                    use_container_width=False,  # This ensures button is only as wide as needed
+                    key="download_map"
+                )
+                button_desc = "Download Map"
+            else:
+                button_desc = "Render Final"
             st.markdown(
-                '<div class="button-desc">Download Map</div></div>',
+                f'<div class="button-desc">{button_desc}</div></div>',
                 unsafe_allow_html=True
             )
 
-        st.session_state['study_area_map'] = buf
+        # Later pages take the final render when there is one, the preview otherwise
+        artifacts.put(session_id, 'study_area_map', final_png if final_png is not None else png)
+        if final_png is None:
+            st.caption(f"Preview at {PREVIEW_DPI} dpi. Render the final map for the {FINAL_DPI} dpi download.")
+        st.caption(f"{stages.summary('Study area pipeline')} · {artifacts.summary(session_id)} · {figure_summary()}")
 
     # --- Navigation ---
     if st.button("Next: Overview Maps ➡️"):
+        if final_png is None:
+            artifacts.put(session_id, 'study_area_map', render_final())
         st.switch_page("pages/02_🗺️_Overview_Maps.py")
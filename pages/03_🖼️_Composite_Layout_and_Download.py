@@ -1,9 +1,18 @@
 import streamlit as st
-from PIL import Image
-import io
 import datetime  # <-- ADD THIS
+import numpy as np
+from utils.metrics import perf_panel
+from utils.artifacts import get_artifact_store
+from utils.sessions import get_session_id
+from utils.composite import (
+    DEFAULT_TEMPLATE, LAYOUT_TEMPLATES, PANELS, VECTOR_FORMATS, VECTOR_MIMES, compose_png, compose_vector,
+)
+from utils.pipeline import map_painters
+from utils.render_cache import StageCache, make_key
+from utils.study_area import FINAL_DPI, fetch_base_raster, load_north_arrow
 
 st.set_page_config(page_title="Composite Layout", page_icon="assets/br_logo.png", layout="wide")
+perf_panel()  # admins only; see utils/metrics.py
 # --- Align Help Expander to Top Right ---
 col1, col2 = st.columns([7, 3])
 with col2:
@@ -21,67 +30,91 @@ with col2:
     st.image("assets/PaperMap_logo.png", width=180)
 st.title("🖼️ Composite Layout & Download")
 
-def resize_image(im, width):
-    return im.resize((width, int(im.height * width / im.width)), Image.LANCZOS)
-
-def combine_images(imgs_left, img_right):
-    small_width = 300
-    small_imgs = [resize_image(im, small_width) for im in imgs_left]
-    h1, h2, h3 = [im.height for im in small_imgs]
-    right_aspect = img_right.height / img_right.width
-    big_width = 700
-    big_height = int(big_width * right_aspect)
-    total_left_height = h1 + h2 + h3
-    canvas_height = max(total_left_height, big_height)
-    if total_left_height > big_height:
-        big_height = total_left_height
-        big_width = int(big_height / right_aspect)
-        img_right_resized = img_right.resize((big_width, big_height), Image.LANCZOS)
-    else:
-        img_right_resized = img_right.resize((big_width, big_height), Image.LANCZOS)
-    canvas_width = small_width + big_width
-    gap = (canvas_height - (h1 + h2 + h3)) // 2 if canvas_height > (h1 + h2 + h3) else 0
-    y1 = 0
-    y2 = h1 + gap
-    y3 = y2 + h2 + gap
-    left_strip = Image.new('RGBA', (small_width, canvas_height), (255,255,255,255))
-    left_strip.paste(small_imgs[0], (0, y1))
-    left_strip.paste(small_imgs[1], (0, y2))
-    left_strip.paste(small_imgs[2], (0, y3))
-    combined = Image.new('RGBA', (canvas_width, canvas_height), (255,255,255,255))
-    combined.paste(left_strip, (0,0))
-    combined.paste(img_right_resized, (small_width, 0))
-    return combined
-
-# --- Load from session_state ---
-imgs_left = []
-for key in ['india_map', 'state_map', 'district_map']:
-    buf = st.session_state.get(key)
-    if buf is not None:
-        buf.seek(0)
-        imgs_left.append(Image.open(buf))
-    else:
-        imgs_left.append(None)
-
-buf_right = st.session_state.get('study_area_map')
-img_right = None
-if buf_right is not None:
-    buf_right.seek(0)
-    img_right = Image.open(buf_right)
-
-if all(imgs_left) and img_right:
-    combined = combine_images(imgs_left, img_right)
-    st.image(combined, caption="Final Layout", use_container_width=True)
-    buf = io.BytesIO()
-    combined.save(buf, format="PNG")
-    buf.seek(0)
-    st.download_button(
-        "📥 Download Final Layout as PNG",
-        data=buf,
-        file_name="PaperMaP.png",
-        mime="image/png",
-        use_container_width=True
+# --- Load the maps from the earlier pages ---
+# Kept in the shared artifact store rather than session_state; images spilled
+# to disk under memory pressure are read back here.
+artifacts = get_artifact_store()
+session_id = get_session_id(st.session_state)
+panels = {}
+for key in PANELS:
+    data = artifacts.get(session_id, key)
+    if data is not None:
+        panels[key] = data
+
+# Layouts and vector exports are cached with the session's pipeline stages
+# (shared with pages 01 and 02), keyed on the panel images and settings
+stages = st.session_state.setdefault('stages', StageCache())
+panels_key = make_key(*(panels[key] for key in PANELS)) if len(panels) == len(PANELS) else None
+
+def vector_key(spec, template, width_in, fmt, raster_dpi):
+    return make_key(
+        panels_key, np.asarray(spec["x"], dtype=float).tobytes(), np.asarray(spec["y"], dtype=float).tobytes(),
+        list(map(str, spec["labels"])), spec["extent"], spec["pad"], spec["style"], spec["arrow"],
+        st.session_state.detected_state, st.session_state.covered_districts, template, width_in, fmt, raster_dpi,
     )
+
+def build_vector(spec, template, width_in, fmt, raster_dpi):
+    """
+    Vector layout of the four panels, redrawn from the earlier pages' session
+    state. The basemap comes from the print-resolution tiles page 01 cached
+    for its final render; the export is only cached when that basemap loaded.
+    """
+    try:
+        base = stages.run("base", make_key(spec["extent"], spec["style"]["basemap"], 0),
+                          fetch_base_raster, spec["extent"], spec["style"]["basemap"])
+    except Exception as e:
+        st.warning(f"⚠️ Failed to load basemap: {e}")
+        base = None
+    arrow_img = load_north_arrow() if spec["arrow"] else None
+    painters = map_painters(spec, st.session_state.detected_state, st.session_state.covered_districts, base, arrow_img)
+    if base is None:
+        return compose_vector(panels, painters, template, width_in, fmt, raster_dpi)
+    return stages.run("vector", vector_key(spec, template, width_in, fmt, raster_dpi),
+                      compose_vector, panels, painters, template, width_in, fmt, raster_dpi)
+
+
+if len(panels) == len(PANELS):
+    col_layout, col_format, col_width = st.columns(3)
+    with col_layout:
+        template = st.selectbox("Layout", list(LAYOUT_TEMPLATES), index=list(LAYOUT_TEMPLATES).index(DEFAULT_TEMPLATE))
+    with col_format:
+        formats = ["PNG"] + (list(VECTOR_FORMATS) if 'study_area_spec' in st.session_state else [])
+        out_format = st.selectbox("Format", formats, index=0)
+    with col_width:
+        if out_format == "PNG":
+            width = st.selectbox("Width (px)", [1000, 2000, 3000], index=0)
+        else:
+            width_in = st.number_input("Width (in)", 3.0, 20.0, 7.2, 0.1)
+    png_width = width if out_format == "PNG" else None
+    png = stages.run("layout", make_key(panels_key, template, png_width), compose_png, panels, template, png_width)
+    st.image(png, caption="Final Layout", use_container_width=True)
+    st.caption(artifacts.summary(session_id))
+    if out_format == "PNG":
+        st.download_button(
+            "📥 Download Final Layout as PNG",
+            data=png,
+            file_name="PaperMaP.png",
+            mime="image/png",
+            use_container_width=True
+        )
+    else:
+        # Maps redrawn as vectors in one figure; only the basemap is embedded as an image
+        fmt = VECTOR_FORMATS[out_format]
+        raster_dpi = st.select_slider("Basemap resolution (dpi)", [150, 300, 600], value=FINAL_DPI)
+        spec = st.session_state['study_area_spec']
+        # Built only on request; reused until the panels or settings change
+        data = stages.peek("vector", vector_key(spec, template, width_in, fmt, raster_dpi))
+        if data is None and st.button(f"🖨️ Build {out_format}", use_container_width=True):
+            with st.spinner(f"Building vector {out_format}..."):
+                data = build_vector(spec, template, width_in, fmt, raster_dpi)
+        if data is not None:
+            st.download_button(
+                f"📥 Download Final Layout as {out_format}",
+                data=data,
+                file_name=f"PaperMaP.{fmt}",
+                mime=VECTOR_MIMES[fmt],
+                use_container_width=True
+            )
 else:
     st.info("Please generate India, State, District, and Study Area maps on the previous pages first.")
 
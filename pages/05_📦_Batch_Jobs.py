@@ -0,0 +1,123 @@
+import streamlit as st
+import pandas as pd
+from utils.metrics import perf_panel
+from utils.composite import DEFAULT_TEMPLATE, LAYOUT_TEMPLATES, VECTOR_FORMATS
+from utils.jobs import expand_uploads, get_job_queue
+from utils.sessions import get_session_id
+from utils.study_area import DEFAULT_STYLE, FINAL_DPI
+from utils.tile_cache import BASEMAP_OPTIONS
+
+# --- Form Submission Check ---
+if not st.session_state.get('form_submitted', False):
+    st.error("⚠️ Please fill the basic details on the Welcome page first.")
+    st.stop()
+
+st.set_page_config(page_title="Batch Jobs", page_icon="assets/br_logo.png", layout="wide")
+perf_panel()  # admins only; see utils/metrics.py
+
+# --- Align Help Expander to Top Right ---
+col1, col2 = st.columns([7, 3])
+with col2:
+    with st.expander("❓ Help", expanded=False):
+        st.markdown("""
+        Upload several site tables (or one ZIP of them) to render a composite
+        layout for each. Jobs run in the background; you can leave this page
+        open or come back to it, and download every composite as one ZIP.
+
+        **Contact:**
+        📧 [amalrenv@gmail.com](https://mail.google.com/mail/?view=cm&to=amalrenv@gmail.com
+)
+        """)
+
+col1, col2, col3 = st.columns([1,2,1])
+with col2:
+    st.image("assets/PaperMap_logo.png", width=180)
+st.title("📦 Batch Jobs")
+
+queue = get_job_queue()
+session_id = get_session_id(st.session_state)
+
+# --- Queue new jobs ---
+with st.form("batch_jobs_form", clear_on_submit=True):
+    files = st.file_uploader(
+        "Upload CSV, XLS or XLSX site tables, or a ZIP of them",
+        type=["csv", "xls", "xlsx", "zip"], accept_multiple_files=True
+    )
+    col_basemap, col_layout, col_formats = st.columns(3)
+    # Start from the style set up on the study area page, if any
+    base_style = st.session_state.get('study_area_spec', {}).get("style", DEFAULT_STYLE)
+    with col_basemap:
+        basemap = st.selectbox("Basemap", list(BASEMAP_OPTIONS), index=list(BASEMAP_OPTIONS).index(base_style["basemap"]))
+    with col_layout:
+        template = st.selectbox("Layout", list(LAYOUT_TEMPLATES), index=list(LAYOUT_TEMPLATES).index(DEFAULT_TEMPLATE))
+    with col_formats:
+        formats = st.multiselect("Formats", ["PNG"] + list(VECTOR_FORMATS), default=["PNG"])
+    submitted = st.form_submit_button("Queue Jobs")
+
+if submitted:
+    try:
+        tables = expand_uploads(files or [])
+    except Exception as e:
+        tables = []
+        st.error(f"Could not read the upload: {e}")
+    if tables and formats:
+        options = {
+            "style": dict(base_style, basemap=basemap),
+            "template": template,
+            "formats": [VECTOR_FORMATS.get(f, "png") for f in formats],
+            "raster_dpi": FINAL_DPI,
+        }
+        for name, data in tables:
+            queue.submit(session_id, name, data, options)
+        st.success(f"Queued {len(tables)} job(s).")
+    elif not formats:
+        st.warning("Choose at least one output format.")
+    elif files:
+        st.warning("No CSV, XLS or XLSX files found in the upload.")
+
+
+# --- Progress ---
+# Polls the shared queue once a second while this session has jobs running;
+# the renders themselves happen in worker processes.
+@st.fragment(run_every=1.0 if queue.active(session_id) else None)
+def job_progress():
+    jobs = queue.jobs(session_id)
+    if not jobs:
+        st.info("No jobs yet. Upload site tables above to start.")
+        return
+    active = queue.active(session_id)
+    finished = sum(job["status"] in ("done", "failed") for job in jobs)
+    st.progress(finished / len(jobs), text=f"{finished} of {len(jobs)} job(s) finished")
+    st.dataframe(
+        pd.DataFrame([{
+            "File": job["name"],
+            "Status": job["status"],
+            "Stage": job["stage"] or "",
+            "Progress": job["progress"],
+            "Seconds": job["seconds"],
+            "Error": job["error"] or "",
+        } for job in jobs]),
+        column_config={"Progress": st.column_config.ProgressColumn("Progress", min_value=0.0, max_value=1.0)},
+        hide_index=True, use_container_width=True
+    )
+    if active:
+        return
+    if st.session_state.get('jobs_polling'):
+        # Last poll: rerun the whole page once so polling stops
+        st.session_state['jobs_polling'] = False
+        st.rerun()
+    if any(job["status"] == "done" for job in jobs):
+        st.download_button(
+            "📥 Download All Composites (ZIP)",
+            data=queue.zip_outputs(session_id),
+            file_name="PaperMap_batch.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+    if st.button("Clear Finished Jobs"):
+        queue.clear(session_id)
+        st.rerun()
+
+
+st.session_state['jobs_polling'] = queue.active(session_id)
+job_progress()
@@ -0,0 +1,64 @@
+# tests/test_artifacts.py
+#
+# ArtifactStore cleanup: a session's images, in memory and spilled to disk,
+# are deleted once the session has ended or has been idle for the TTL.
+#
+#   python -m unittest tests.test_artifacts
+
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.artifacts import ArtifactStore
+from utils.sessions import get_session_id
+
+
+class ArtifactCleanupTest(unittest.TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp(prefix="papermap-artifacts-test-")
+        self.addCleanup(shutil.rmtree, self.spill_dir, ignore_errors=True)
+        # Room for one 1 kB image per session in memory; the second one spills
+        self.store = ArtifactStore(session_bytes=1500, memory_bytes=10_000, spill_dir=self.spill_dir)
+
+    def fill(self, session_id):
+        self.store.put(session_id, "india_map", b"i" * 1000)
+        self.store.put(session_id, "study_area_map", b"s" * 1000)
+
+    def test_ended_session_is_deleted(self):
+        session_state = {}
+        session_id = get_session_id(session_state)
+        self.fill(session_id)
+        self.assertTrue(os.listdir(os.path.join(self.spill_dir, session_id)))
+
+        del session_state  # Streamlit discarding the session's state
+        gc.collect()
+        self.store.put("other", "india_map", b"o" * 10)  # any later call sweeps
+
+        self.assertEqual(self.store.session_stats(session_id)["entries"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.spill_dir, session_id)))
+        self.assertEqual(self.store.get("other", "india_map"), b"o" * 10)
+
+    def test_live_session_is_kept(self):
+        session_state = {}
+        session_id = get_session_id(session_state)
+        self.assertEqual(get_session_id(session_state), session_id)
+        self.fill(session_id)
+        gc.collect()
+        self.store.put("other", "india_map", b"o" * 10)
+
+        self.assertEqual(self.store.get(session_id, "study_area_map"), b"s" * 1000)
+        self.assertEqual(self.store.get(session_id, "india_map"), b"i" * 1000)  # reloaded from disk
+
+    def test_idle_session_expires(self):
+        self.store.ttl = 0
+        self.fill("idle")
+        self.store.put("other", "india_map", b"o" * 10)
+
+        self.assertEqual(self.store.session_stats("idle")["entries"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.spill_dir, "idle")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+# tests/test_boundary_store.py
+#
+# Converting a boundary layer to Arrow IPC (`python -m utils.build_data
+# convert`) and loading it back through boundary_store, on a small layer
+# written to a temporary data/ directory.
+#
+#   python -m unittest tests.test_boundary_store
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.feather as feather
+import shapely
+from shapely.geometry import MultiPolygon, box
+
+from utils import boundary_store
+from utils.boundary_store import (
+    GEOGRAPHIC_CRS, STATE_SHAPEFILE_PATH, WEB_MERCATOR_CRS, converted_path, get_states, layer_bounds,
+)
+from utils.build_data import convert_layer
+
+
+def convert(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        convert_layer(path)
+
+
+def sample_states():
+    return gpd.GeoDataFrame(
+        {"State_Name": ["KERALA", "TAMIL NADU", "LAKSHADWEEP"]},
+        geometry=[box(74, 8, 77, 12), box(77, 8, 80, 13),
+                  MultiPolygon([box(71.5, 10, 72, 10.5), box(72.5, 11, 73, 11.5)])],
+        crs=GEOGRAPHIC_CRS,
+    )
+
+
+class ConvertedLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp(prefix="papermap-boundary-test-")
+        os.chdir(self.root)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.addCleanup(os.chdir, self.cwd)
+        self.addCleanup(boundary_store.clear)
+        os.makedirs(os.path.dirname(STATE_SHAPEFILE_PATH))
+        self.states = sample_states()
+        self.states.to_file(STATE_SHAPEFILE_PATH)
+        boundary_store.clear()
+
+    def assert_same_layer(self, loaded, expected):
+        self.assertEqual(list(loaded["State_Name"]), list(expected["State_Name"]))
+        self.assertTrue(shapely.equals(loaded.geometry.values, expected.geometry.values).all())
+        self.assertEqual(loaded.crs, expected.crs)
+
+    def test_converted_layer_reads_back_in_every_crs(self):
+        convert(STATE_SHAPEFILE_PATH)
+        boundary_store.clear()
+
+        self.assert_same_layer(get_states(), self.states)
+        self.assert_same_layer(get_states(WEB_MERCATOR_CRS), self.states.to_crs(WEB_MERCATOR_CRS))
+        # Loaded from the converted files (Arrow-backed columns), not the shapefile
+        self.assertEqual(str(get_states()["State_Name"].dtype), "large_string[pyarrow]")
+
+    def test_reconverting_over_mapped_files(self):
+        convert(STATE_SHAPEFILE_PATH)
+        boundary_store.clear()
+        convert(STATE_SHAPEFILE_PATH)  # reads the mapped converted copy it replaces
+        boundary_store.clear()
+
+        self.assert_same_layer(get_states(), self.states)
+
+    def test_converted_layer_is_readable_by_geopandas(self):
+        convert(STATE_SHAPEFILE_PATH)
+        self.assert_same_layer(gpd.read_feather(converted_path(STATE_SHAPEFILE_PATH, GEOGRAPHIC_CRS)), self.states)
+
+    def test_layer_bounds_come_from_metadata(self):
+        convert(STATE_SHAPEFILE_PATH)
+        boundary_store.clear()
+
+        self.assertEqual(layer_bounds(STATE_SHAPEFILE_PATH), self.states.total_bounds.tolist())
+        self.assertEqual(boundary_store.store_stats(), [])  # no layer was loaded
+
+    def test_file_without_geo_metadata(self):
+        # A GeoArrow table written without "geo" metadata, as earlier converts did
+        os.makedirs(os.path.dirname(converted_path(STATE_SHAPEFILE_PATH, GEOGRAPHIC_CRS)))
+        for crs in (GEOGRAPHIC_CRS, WEB_MERCATOR_CRS):
+            table = pa.table(self.states.to_crs(crs).to_arrow(geometry_encoding="geoarrow"))
+            feather.write_feather(table, converted_path(STATE_SHAPEFILE_PATH, crs), compression="uncompressed")
+
+        self.assert_same_layer(get_states(), self.states)
+        self.assertEqual(layer_bounds(STATE_SHAPEFILE_PATH), self.states.total_bounds.tolist())
+
+    def test_shared_layer_is_read_only(self):
+        for converted in (False, True):
+            if converted:
+                convert(STATE_SHAPEFILE_PATH)
+            boundary_store.clear()
+            with self.subTest(converted=converted):
+                states = get_states()
+                with self.assertRaises(ValueError):
+                    states.geometry.values[0] = box(0, 0, 1, 1)
+                states.loc[0, "State_Name"] = "CHANGED"
+                states["area"] = states.area
+                self.assert_same_layer(get_states(), self.states)
+                self.assertNotIn("area", get_states().columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
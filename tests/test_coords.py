@@ -0,0 +1,71 @@
+# tests/test_coords.py
+#
+# parse_latlon_series against the row-wise parse_latlon it replaced: the
+# notations both accept give the same degrees, and the inputs where the
+# vectorized parser deliberately differs are pinned to its results.
+#
+#   python -m unittest tests.test_coords
+
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.coords import parse_latlon, parse_latlon_series
+
+# Cells both parsers read the same way
+AGREED = [
+    "9.9732", "-9.9732", "+9.5", " 9.5 ", "1e2", "9.9732N", "76.2821W", "76e", "9N", "12°",
+    "9°58'23\"N", "76°16'56\"E", "9:58:23S", "9°58.383'N", "9°58'", "9º58’23”N",
+]
+
+# Cells where parse_latlon was wrong and parse_latlon_series is not
+CHANGED = {
+    "9 58 23 N": (95823.0, 9 + 58 / 60 + 23 / 3600),  # spaces were dropped before matching
+    "76 16.934 W": (-7616.934, -(76 + 16.934 / 60)),
+    "-0°30'": (0.5, -0.5),  # the sign of -0 degrees was lost
+    "9°58'23''N": (math.nan, 9 + 58 / 60 + 23 / 3600),  # two single quotes for seconds
+}
+
+UNPARSEABLE = ["", "abc", "91 N S", "9°58'23\"X", None]
+
+
+def parse(cells):
+    return parse_latlon_series(pd.Series(cells, dtype=object))
+
+
+class ParseLatlonSeriesTest(unittest.TestCase):
+    def test_agrees_with_row_wise_parser(self):
+        parsed, failed = parse(AGREED)
+        np.testing.assert_allclose(parsed.to_numpy(), [parse_latlon(cell) for cell in AGREED])
+        self.assertFalse(failed.any())
+
+    def test_pinned_behaviour_changes(self):
+        parsed, failed = parse(list(CHANGED))
+        for (cell, (old, new)), value in zip(CHANGED.items(), parsed):
+            with self.subTest(cell=cell):
+                np.testing.assert_equal(parse_latlon(cell), old)
+                self.assertAlmostEqual(value, new)
+        self.assertFalse(failed.any())
+
+    def test_failed_rows_are_flagged(self):
+        parsed, failed = parse(["9.5"] + UNPARSEABLE)
+        self.assertEqual(failed.tolist(), [False] + [True] * len(UNPARSEABLE))
+        self.assertTrue(parsed[failed].isna().all())
+
+    def test_numeric_column_takes_fast_path(self):
+        parsed, failed = parse_latlon_series(pd.Series([9.5, np.nan, 76], index=[10, 11, 12]))
+        self.assertEqual(parsed.index.tolist(), [10, 11, 12])
+        np.testing.assert_equal(parsed.to_numpy(), [9.5, np.nan, 76.0])
+        self.assertEqual(failed.tolist(), [False, True, False])
+
+    def test_mixed_numbers_and_text(self):
+        # As from an Excel sheet with some hand-typed DMS cells
+        parsed, failed = parse([9.5, "76 30 E", 3, True])
+        np.testing.assert_equal(parsed.to_numpy(), [9.5, 76.5, 3.0, np.nan])
+        self.assertEqual(failed.tolist(), [False, False, False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# tests/test_render_cache.py
+#
+# StageCache: results that are None are cached like any other, peek() reads
+# without counting, and the all-sessions cap copes with nothing left to evict.
+#
+#   python -m unittest tests.test_render_cache
+
+import unittest
+from unittest import mock
+
+from utils import render_cache
+from utils.render_cache import StageCache
+
+
+class StageCacheTest(unittest.TestCase):
+    def test_none_result_is_a_hit(self):
+        stages = StageCache()
+        calls = []
+        for _ in range(2):
+            self.assertIsNone(stages.run("vector", "k", lambda: calls.append(1)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(stages.stats()["vector"]["hits"], 1)
+
+    def test_peek_leaves_counters_and_order(self):
+        stages = StageCache()
+        stages.run("vector", "a", lambda: b"a")
+        stages.run("final", "b", lambda: b"b")
+        self.assertEqual(stages.peek("vector", "a"), b"a")
+        self.assertIsNone(stages.peek("final", "missing"))
+
+        self.assertEqual(stages.stats()["vector"], {"entries": 1, "bytes": 1, "hits": 0, "misses": 1})
+        self.assertNotIn("hits", stages.stats().get("missing", {}))
+        self.assertEqual(list(stages._entries), [("vector", "a"), ("final", "b")])
+
+    def test_total_cap_with_nothing_to_evict(self):
+        stages = StageCache()
+        # Bytes still counted for a cache that has left the registry but not yet run __del__
+        with mock.patch.object(render_cache, "_stage_bytes", render_cache.STAGE_CACHE_TOTAL_MB * 1e6 + 10):
+            self.assertEqual(stages.run("vector", "a", lambda: b"a"), b"a")
+        self.assertEqual(stages.stats()["vector"]["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# tests/test_tile_cache.py
+#
+# TileCache and fetch_mosaic against a tile server on localhost, so the
+# cold/warm, eviction and offline paths run without touching the network.
+# The server answers every request with the same 256 px PNG, so a byte
+# budget is a whole number of tiles.
+#
+#   python -m unittest tests.test_tile_cache   (or: python -m pytest tests)
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import xyzservices
+from PIL import Image
+
+from utils.tile_cache import TileCache, TileUnavailableError, fetch_mosaic, tile_range, tile_span
+
+
+def tile_png():
+    buf = io.BytesIO()
+    Image.new("RGB", (256, 256), (200, 220, 240)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+TILE = tile_png()
+ERROR_PAGE = b"<html><body>Rate limit exceeded</body></html>"
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        # Under /error/ the server fails the way some tile servers do: status 200, an HTML page
+        body, content_type = (ERROR_PAGE, "text/html") if self.path.startswith("/error/") else (TILE, "image/png")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TileCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), TileHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.provider = xyzservices.TileProvider(
+            name="Local Test", url=f"http://127.0.0.1:{cls.server.server_port}/{{z}}/{{x}}/{{y}}.png",
+            attribution="", max_zoom=19,
+        )
+        cls.error_provider = xyzservices.TileProvider(
+            name="Local Errors", url=f"http://127.0.0.1:{cls.server.server_port}/error/{{z}}/{{x}}/{{y}}.png",
+            attribution="", max_zoom=19,
+        )
+        cls.tile_bytes = len(TILE)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="papermap-tiles-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.server.requests.clear()
+
+    def cache(self, **kwargs):
+        kwargs.setdefault("offline", False)
+        return TileCache(self.root, timeout=5, **kwargs)
+
+    def extent(self, z, cols=2, rows=2):
+        # Interior of a block of tiles at zoom z, so tile_range covers exactly cols x rows
+        span = tile_span(z)
+        left, top = -span * cols / 2, span * rows / 2
+        inset = span / 10
+        return left + inset, top - rows * span + inset, left + cols * span - inset, top - inset
+
+    def test_cold_fetch_downloads_and_stores_every_tile(self):
+        cache = self.cache()
+        extent = self.extent(5)
+        image, bounds = fetch_mosaic(extent, self.provider, zoom=5, cache=cache)
+
+        x0, x1, y0, y1 = tile_range(extent, 5)
+        self.assertEqual((x1 - x0 + 1, y1 - y0 + 1), (2, 2))
+        self.assertEqual(image.shape, (512, 512, 4))
+        self.assertEqual(len(self.server.requests), 4)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["fetches"], stats["hits"]), (4, 4, 0))
+        self.assertEqual((stats["tiles"], stats["bytes"]), (4, 4 * self.tile_bytes))
+        for x in (x0, x1):
+            for y in (y0, y1):
+                self.assertTrue(os.path.exists(cache.tile_path(self.provider, 5, x, y)))
+
+    def test_warm_fetch_makes_no_requests(self):
+        extent = self.extent(5)
+        cold, _ = fetch_mosaic(extent, self.provider, zoom=5, cache=self.cache())
+        self.server.requests.clear()
+
+        # A fresh cache over the same directory, as after a server restart
+        cache = self.cache()
+        warm, _ = fetch_mosaic(extent, self.provider, zoom=5, cache=cache)
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual((cache.stats()["hits"], cache.stats()["fetches"]), (4, 0))
+        self.assertTrue((warm == cold).all())
+
+    def test_evicts_least_recently_used_tile_at_budget(self):
+        cache = self.cache(max_bytes=2 * self.tile_bytes)
+        first, second, third = (5, 1, 1), (5, 2, 1), (5, 3, 1)
+        cache.get(self.provider, *first)
+        cache.get(self.provider, *second)
+        cache.get(self.provider, *first)  # hit: `second` is now least recently used
+        cache.get(self.provider, *third)
+
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], cache.max_bytes)
+        self.assertFalse(os.path.exists(cache.tile_path(self.provider, *second)))
+        self.assertTrue(os.path.exists(cache.tile_path(self.provider, *first)))
+        self.assertTrue(os.path.exists(cache.tile_path(self.provider, *third)))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_offline_serves_cached_tiles_and_never_fetches(self):
+        fetch_mosaic(self.extent(5), self.provider, zoom=5, cache=self.cache())
+        self.server.requests.clear()
+
+        cache = self.cache(offline=True)
+        fetch_mosaic(self.extent(5), self.provider, zoom=5, cache=cache)
+        self.assertIsNone(cache.get(self.provider, 6, 0, 0))
+        with self.assertRaises(TileUnavailableError):
+            fetch_mosaic(self.extent(6), self.provider, zoom=6, cache=cache)
+
+        self.assertEqual(self.server.requests, [])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["fetches"], stats["tiles"]), (4, 0, 4))
+        self.assertEqual(stats["misses"], 1 + 4)
+
+    def test_error_page_is_not_cached(self):
+        cache = self.cache()
+        self.assertIsNone(cache.get(self.error_provider, 5, 1, 1))
+        self.assertFalse(os.path.exists(cache.tile_path(self.error_provider, 5, 1, 1)))
+        self.assertIsNone(cache.get(self.error_provider, 5, 1, 1))  # asked for again, not served from disk
+
+        stats = cache.stats()
+        self.assertEqual((stats["failures"], stats["fetches"], stats["tiles"], stats["hits"]), (2, 0, 0, 0))
+        self.assertEqual(len(self.server.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
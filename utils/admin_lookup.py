@@ -0,0 +1,94 @@
+# utils/admin_lookup.py
+#
+# Point-in-state/district lookup over a single STRtree that holds both boundary
+# layers. The tree is built once per process and rebuilt only when the
+# boundary store reloads a layer from disk.
+
+import threading
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from utils.boundary_store import (
+    DISTRICT_SHAPEFILE_PATH,
+    STATE_SHAPEFILE_PATH,
+    get_districts,
+    get_states,
+    layer_version,
+)
+from utils.metrics import timed
+
+_lock = threading.Lock()
+_index = None
+
+
+@timed("admin.build_index")
+def _build_index(version):
+    states = get_states()
+    districts = get_districts()
+    geoms = np.concatenate([states.geometry.to_numpy(), districts.geometry.to_numpy()])
+    shapely.prepare(geoms)
+    # A trailing None lets "no match" (-1) index straight into the name arrays.
+    return {
+        "version": version,
+        "geoms": geoms,
+        "tree": shapely.STRtree(geoms),
+        "n_states": len(states),
+        "state_names": np.append(states["State_Name"].to_numpy(dtype=object), None),
+        "district_names": np.append(districts["District"].to_numpy(dtype=object), None),
+    }
+
+
+def get_index():
+    global _index
+    version = (layer_version(STATE_SHAPEFILE_PATH), layer_version(DISTRICT_SHAPEFILE_PATH))
+    with _lock:
+        if _index is None or _index["version"] != version:
+            _index = _build_index(version)
+        return _index
+
+
+def _first_match(point_idx, tree_idx, n_points):
+    # Keep the lowest tree index per point, mirroring the first row a left
+    # sjoin would produce for points on a shared boundary.
+    out = np.full(n_points, -1, dtype=np.intp)
+    if len(point_idx):
+        order = np.lexsort((tree_idx, point_idx))
+        point_idx, tree_idx = point_idx[order], tree_idx[order]
+        first = np.unique(point_idx, return_index=True)[1]
+        out[point_idx[first]] = tree_idx[first]
+    return out
+
+
+@timed("admin.lookup")
+def lookup_admin(lon, lat, index=None):
+    """
+    Returns a DataFrame with `State_Name` and `District` for every lon/lat pair
+    (EPSG:4326), with None where a point falls outside all polygons. Both
+    layers are resolved with one vectorized STRtree query.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    idx = get_index()
+    n_states = idx["n_states"]
+
+    # Bounding-box candidates from the tree, then an exact test against the
+    # prepared polygons; cheaper than a "within" predicate query, which
+    # would prepare every point instead of the polygons.
+    points = shapely.points(lon, lat)
+    point_idx, tree_idx = idx["tree"].query(points)
+    inside = shapely.contains_xy(idx["geoms"][tree_idx], lon[point_idx], lat[point_idx])
+    point_idx, tree_idx = point_idx[inside], tree_idx[inside]
+
+    is_state = tree_idx < n_states
+    state = _first_match(point_idx[is_state], tree_idx[is_state], len(points))
+    district = _first_match(point_idx[~is_state], tree_idx[~is_state] - n_states, len(points))
+
+    return pd.DataFrame(
+        {
+            "State_Name": idx["state_names"][state],
+            "District": idx["district_names"][district],
+        },
+        index=index,
+    )
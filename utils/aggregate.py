@@ -0,0 +1,113 @@
+# utils/aggregate.py
+#
+# Aggregation of dense site sets before plotting: points projected to
+# EPSG:3857 are binned on a square grid, a hexagonal grid, or clustered by
+# distance, and each group is drawn as one marker sized by its count. The bin
+# size is given in points on the page, so the number of markers is bounded by
+# the figure size rather than by the number of rows.
+
+import numpy as np
+
+from utils.metrics import timed
+
+AGGREGATE_METHODS = {
+    "Off": None,
+    "Grid": "grid",
+    "Hexbin": "hexbin",
+    "Cluster": "cluster",
+}
+
+
+def data_per_point(ax):
+    """Data units per typographic point along x, once the aspect ratio is applied."""
+    ax.apply_aspect()
+    xmin, xmax = ax.get_xlim()
+    return (xmax - xmin) / (ax.bbox.width * 72 / ax.get_figure().dpi)
+
+
+def _group(*keys):
+    """Group ids (0..n-1) for rows of equal integer `keys`."""
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        key = key - key.min()
+        combined = combined * (int(key.max()) + 1) + key
+    _, inverse = np.unique(combined, return_inverse=True)
+    return inverse
+
+
+# --- Binning ---
+def grid_bins(x, y, cell):
+    return _group(np.floor(x / cell).astype(np.int64), np.floor(y / cell).astype(np.int64))
+
+
+def hex_bins(x, y, cell):
+    """Nearest centre on a hexagonal lattice with `cell` spacing (as matplotlib's hexbin)."""
+    xs = x / cell
+    ys = y / (cell * np.sqrt(3))
+    ix1, iy1 = np.round(xs), np.round(ys)
+    ix2, iy2 = np.floor(xs), np.floor(ys)
+    d1 = (xs - ix1) ** 2 + 3 * (ys - iy1) ** 2
+    d2 = (xs - ix2 - 0.5) ** 2 + 3 * (ys - iy2 - 0.5) ** 2
+    first = d1 < d2
+    return _group(np.where(first, ix1, ix2).astype(np.int64),
+                  np.where(first, iy1, iy2).astype(np.int64),
+                  first.astype(np.int64))
+
+
+def cluster_bins(x, y, radius):
+    """
+    Greedy distance clustering: points are first snapped to a fine grid,
+    then the heaviest remaining grid bin absorbs every bin whose centroid
+    lies within `radius` of its own.
+    """
+    fine = grid_bins(x, y, radius / 2)
+    counts = np.bincount(fine)
+    cx = np.bincount(fine, weights=x) / counts
+    cy = np.bincount(fine, weights=y) / counts
+
+    buckets = {}
+    for i, key in enumerate(zip(np.floor(cx / radius).astype(np.int64).tolist(),
+                                np.floor(cy / radius).astype(np.int64).tolist())):
+        buckets.setdefault(key, []).append(i)
+
+    cluster = np.full(len(counts), -1, dtype=np.int64)
+    n_clusters = 0
+    for i in np.argsort(-counts, kind="stable"):
+        if cluster[i] >= 0:
+            continue
+        bx, by = int(np.floor(cx[i] / radius)), int(np.floor(cy[i] / radius))
+        for key in [(bx + dx, by + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]:
+            for j in buckets.get(key, ()):
+                if cluster[j] < 0 and (cx[j] - cx[i]) ** 2 + (cy[j] - cy[i]) ** 2 <= radius ** 2:
+                    cluster[j] = n_clusters
+        n_clusters += 1
+    return cluster[fine]
+
+
+@timed("aggregate.points")
+def aggregate_points(x, y, method, cell):
+    """
+    Returns `(cx, cy, counts, first)`: the count-weighted centroid and size of
+    each group, and the index of its first member in the input.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if method == "grid":
+        groups = grid_bins(x, y, cell)
+    elif method == "hexbin":
+        groups = hex_bins(x, y, cell)
+    elif method == "cluster":
+        groups = cluster_bins(x, y, cell)
+    else:
+        raise ValueError(f"Unknown aggregation method: {method}")
+    counts = np.bincount(groups)
+    cx = np.bincount(groups, weights=x) / counts
+    cy = np.bincount(groups, weights=y) / counts
+    first = np.full(len(counts), len(x), dtype=np.int64)
+    np.minimum.at(first, groups, np.arange(len(x)))
+    return cx, cy, counts, first
+
+
+def count_marker_sizes(counts, marker_size):
+    """Marker areas whose radius grows by one marker radius per tenfold count."""
+    return marker_size * (1 + np.log10(counts)) ** 2
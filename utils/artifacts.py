@@ -0,0 +1,216 @@
+# utils/artifacts.py
+#
+# Rendered map images handed from page to page (the study area map from
+# page 01, the overview maps from page 02), kept out of st.session_state.
+# One store is shared by every session. Each session and the server as a
+# whole have a byte budget. When a put goes over either budget, the least
+# recently used images are moved to a local spill directory, and a later
+# `get` loads them back into memory. Without a spill directory they are
+# dropped, and the page that made them has to render them again.
+# A session's images are deleted, from memory and disk, once the session has
+# ended (see utils/sessions.py), and in any case when it has not used them
+# for the TTL. A spill directory the store created itself is removed when the
+# server exits.
+#
+#   PAPERMAP_ARTIFACT_SESSION_MB    in-memory budget per session (default: 24)
+#   PAPERMAP_ARTIFACT_MEMORY_MB     in-memory budget for all sessions (default: 256)
+#   PAPERMAP_ARTIFACT_DIR           spill directory (default: a new temp dir; empty disables spilling)
+#   PAPERMAP_ARTIFACT_TTL_MINUTES   idle time after which a session's images are deleted (default: 60)
+
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils.sessions import ended_sessions
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SESSION_MB = float(os.environ.get("PAPERMAP_ARTIFACT_SESSION_MB", 24))
+ARTIFACT_MEMORY_MB = float(os.environ.get("PAPERMAP_ARTIFACT_MEMORY_MB", 256))
+ARTIFACT_TTL_SECONDS = float(os.environ.get("PAPERMAP_ARTIFACT_TTL_MINUTES", 60)) * 60
+
+
+def _default_spill_dir():
+    spill_dir = os.environ.get("PAPERMAP_ARTIFACT_DIR")
+    if spill_dir is None:
+        spill_dir = tempfile.mkdtemp(prefix="papermap-artifacts-")
+        atexit.register(shutil.rmtree, spill_dir, ignore_errors=True)
+        return spill_dir
+    return spill_dir or None
+
+
+class ArtifactStore:
+    def __init__(self, session_bytes=ARTIFACT_SESSION_MB * 1e6, memory_bytes=ARTIFACT_MEMORY_MB * 1e6,
+                 spill_dir=None, ttl=ARTIFACT_TTL_SECONDS):
+        self.session_bytes = int(session_bytes)
+        self.memory_bytes = int(memory_bytes)
+        self.spill_dir = spill_dir
+        self.ttl = ttl
+        self.spills = self.reloads = self.drops = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # (session, name) -> (data, digest), least recently used first
+        self._spilled = {}  # (session, name) -> (path, nbytes, digest)
+        self._session_memory = {}  # session -> bytes held in memory
+        self._bytes = 0
+        self._touched = {}  # session -> last put/get time
+        self._ended = ended_sessions()
+
+    # --- Sessions ---
+    def put(self, session_id, name, data):
+        """Stores `data` (bytes) as the session's `name`; a no-op if it is unchanged."""
+        self._expire()
+        data = bytes(data)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        key = (session_id, name)
+        with self._lock:
+            self._touched[session_id] = time.time()
+            held = self._memory.get(key) or self._spilled.get(key)
+            if held is not None and held[-1] == digest:
+                return
+            self._remove(key)
+            self._admit(key, data, digest)
+
+    def get(self, session_id, name):
+        """The session's `name` bytes, loaded back from the spill directory if needed; None if absent."""
+        self._expire()
+        key = (session_id, name)
+        with self._lock:
+            self._touched[session_id] = time.time()
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+            spilled = self._spilled.get(key)
+            if spilled is None:
+                return None
+            path, nbytes, digest = spilled
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning("Lost spilled artifact %s: %s", path, e)
+                del self._spilled[key]
+                return None
+            self.reloads += 1
+            if nbytes <= self.session_bytes:  # larger ones are read from disk every time
+                del self._spilled[key]
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self._admit(key, data, digest)
+            return data
+
+    def drop_session(self, session_id):
+        with self._lock:
+            for key in [k for k in list(self._memory) + list(self._spilled) if k[0] == session_id]:
+                self._remove(key)
+            self._touched.pop(session_id, None)
+            self._session_memory.pop(session_id, None)
+        if self.spill_dir:
+            shutil.rmtree(os.path.join(self.spill_dir, session_id), ignore_errors=True)
+
+    # --- Budgets ---
+    def _admit(self, key, data, digest):
+        session_id = key[0]
+        self._memory[key] = (data, digest)
+        self._session_memory[session_id] = self._session_memory.get(session_id, 0) + len(data)
+        self._bytes += len(data)
+        if len(data) > self.session_bytes:
+            self._evict(key)  # would never fit; keep the session's other images
+            return
+        # The session's own least recently used images go first, then anyone's
+        while self._session_memory[session_id] > self.session_bytes:
+            self._evict(next(k for k in self._memory if k[0] == session_id))
+        while self._bytes > self.memory_bytes:
+            self._evict(next(iter(self._memory)))
+
+    def _evict(self, key):
+        data, digest = self._memory.pop(key)
+        self._session_memory[key[0]] -= len(data)
+        self._bytes -= len(data)
+        if self.spill_dir:
+            path = os.path.join(self.spill_dir, key[0], f"{key[1]}.bin")
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning("Could not spill artifact %s: %s", path, e)
+            else:
+                self._spilled[key] = (path, len(data), digest)
+                self.spills += 1
+                return
+        self.drops += 1
+
+    def _remove(self, key):
+        held = self._memory.pop(key, None)
+        if held is not None:
+            self._session_memory[key[0]] -= len(held[0])
+            self._bytes -= len(held[0])
+        spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            try:
+                os.remove(spilled[0])
+            except OSError:
+                pass
+
+    def _expire(self):
+        ended = set()
+        while self._ended:
+            ended.add(self._ended.popleft())
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [s for s, touched in self._touched.items() if touched < cutoff]
+        for session_id in ended.union(stale):
+            self.drop_session(session_id)
+
+    # --- Reporting ---
+    def session_stats(self, session_id):
+        with self._lock:
+            return {
+                "entries": sum(k[0] == session_id for k in self._memory) + sum(
+                    k[0] == session_id for k in self._spilled),
+                "memory_bytes": self._session_memory.get(session_id, 0),
+                "spilled_bytes": sum(v[1] for k, v in self._spilled.items() if k[0] == session_id),
+                "max_bytes": self.session_bytes,
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._touched),
+                "entries": len(self._memory) + len(self._spilled),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.memory_bytes,
+                "spilled_bytes": sum(v[1] for v in self._spilled.values()),
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "drops": self.drops,
+            }
+
+    def summary(self, session_id):
+        s, total = self.session_stats(session_id), self.stats()
+        spilled = f", {s['spilled_bytes'] / 1e6:.1f} MB on disk" if s["spilled_bytes"] else ""
+        return (f"Session images: {s['entries']}, {s['memory_bytes'] / 1e6:.1f} of {s['max_bytes'] / 1e6:.0f} MB"
+                f" in memory{spilled} · all sessions {total['memory_bytes'] / 1e6:.0f} of"
+                f" {total['max_bytes'] / 1e6:.0f} MB")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(spill_dir=_default_spill_dir())
+        return _store
@@ -0,0 +1,157 @@
+# utils/batch.py
+#
+# Headless batch rendering: one composite per site table in a directory,
+# rendered in parallel worker processes, with a JSON report of per-file
+# timings and failures. Run from the repository root (boundary data and
+# assets are read from data/ and assets/):
+#
+#   python -m utils.batch projects/ --out maps/ --style style.json --format png pdf
+#
+# The style file is a JSON object overriding any DEFAULT_STYLE keys
+# (utils/study_area.py), e.g. {"basemap": "CartoDB Positron", "marker_color": "#0044aa"}.
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from utils.composite import DEFAULT_TEMPLATE, LAYOUT_TEMPLATES, VECTOR_FORMATS
+from utils.pipeline import FILE_TYPES
+from utils.study_area import DEFAULT_STYLE, FINAL_DPI
+from utils.tile_cache import BASEMAP_OPTIONS
+
+REPORT_NAME = "report.json"
+
+
+def load_style(path):
+    """DEFAULT_STYLE overridden by the JSON object at `path` (if any); unknown keys are an error."""
+    style = dict(DEFAULT_STYLE)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(DEFAULT_STYLE))
+        if unknown:
+            raise ValueError(f"Unknown style keys: {', '.join(unknown)}")
+        style.update(overrides)
+    if style["basemap"] not in BASEMAP_OPTIONS:
+        raise ValueError(f"Unknown basemap {style['basemap']!r}; choose from {', '.join(BASEMAP_OPTIONS)}")
+    return style
+
+
+def find_inputs(in_dir):
+    return sorted(
+        os.path.join(in_dir, name) for name in os.listdir(in_dir)
+        if os.path.splitext(name)[1].lstrip(".").lower() in FILE_TYPES and not name.startswith("~$")
+    )
+
+
+# --- Worker ---
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def run_one(path, out_dir, options):
+    """Renders one file; never raises, so one bad input cannot stop the batch."""
+    from utils.pipeline import render_project
+
+    start = time.perf_counter()
+    entry = {"file": path}
+    try:
+        entry.update(render_project(path, out_dir, **options))
+        entry["status"] = "ok"
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def _log(entry):
+    print(f"[{entry['status']}] {entry['file']} ({entry.get('seconds', 0):.1f}s)"
+          + (f": {entry['error']}" if "error" in entry else ""), file=sys.stderr)
+
+
+def run_batch(paths, out_dir, options, jobs=None):
+    """Renders `paths` across `jobs` processes (serially if 1) and returns the report dict."""
+    jobs = jobs or os.cpu_count() or 1
+    started = datetime.datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+    if jobs == 1 or len(paths) == 1:
+        _init_worker()
+        files = []
+        for path in paths:
+            files.append(run_one(path, out_dir, options))
+            _log(files[-1])
+    else:
+        files = []
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(jobs, len(paths)), mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as pool:
+            futures = {pool.submit(run_one, path, out_dir, options): path for path in paths}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    entry = future.result()
+                except Exception as e:  # the worker process itself died
+                    entry = {"file": futures[future], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                _log(entry)
+                files.append(entry)
+        files.sort(key=lambda entry: entry["file"])
+    return {
+        "started": started,
+        "seconds": round(time.perf_counter() - start, 3),
+        "jobs": jobs,
+        "options": {k: v for k, v in options.items() if k != "style"},
+        "style": options.get("style"),
+        "ok": sum(entry["status"] == "ok" for entry in files),
+        "failed": sum(entry["status"] != "ok" for entry in files),
+        "files": files,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.batch")
+    parser.add_argument("input_dir", help="directory of .csv/.xls/.xlsx site tables")
+    parser.add_argument("--out", default="batch_output", help="output directory (default: %(default)s)")
+    parser.add_argument("--style", help="JSON file overriding DEFAULT_STYLE keys")
+    parser.add_argument("--layout", choices=list(LAYOUT_TEMPLATES), default=DEFAULT_TEMPLATE)
+    parser.add_argument("--format", nargs="+", choices=["png"] + list(VECTOR_FORMATS.values()), default=["png"],
+                        dest="formats")
+    parser.add_argument("--width", type=int, help="PNG width in pixels (default: the layout's natural width)")
+    parser.add_argument("--width-in", type=float, default=7.2, help="vector width in inches")
+    parser.add_argument("--raster-dpi", type=int, default=FINAL_DPI, help="basemap resolution in vector outputs")
+    parser.add_argument("--columns", nargs=3, metavar=("SITE", "LAT", "LON"),
+                        help="column names (default: auto-detected per file)")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--report", help=f"report path (default: <out>/{REPORT_NAME})")
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.input_dir)
+    if not paths:
+        parser.error(f"no .csv/.xls/.xlsx files in {args.input_dir}")
+    options = {
+        "style": load_style(args.style),
+        "template": args.layout,
+        "formats": args.formats,
+        "width": args.width,
+        "width_in": args.width_in,
+        "raster_dpi": args.raster_dpi,
+        "columns": tuple(args.columns) if args.columns else (None, None, None),
+    }
+    report = run_batch(paths, args.out, options, args.jobs)
+    os.makedirs(args.out, exist_ok=True)
+    report_path = args.report or os.path.join(args.out, REPORT_NAME)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"{report['ok']} ok, {report['failed']} failed in {report['seconds']:.1f}s -> {report_path}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+# utils/boundary_store.py
+#
+# Process-wide cache of the bundled state/district boundary layers. Every
+# Streamlit session and rerun shares one parsed copy per (path, mtime, CRS).
+# Simplified copies of each layer (built by `python -m utils.build_data
+# pyramids`) are served instead of the full layer when the caller gives the
+# pixel size it will draw at, and per-state partitions of the district layer
+# (built by `python -m utils.build_data partitions`) let a state's districts
+# and bounds be read without loading the national layer. Layers converted
+# to Arrow IPC (`python -m utils.build_data convert`) are memory-mapped
+# instead of parsed, already in the requested CRS.
+#
+# The full layers stay cached for the life of the process. Simplified levels
+# and state partitions share a byte budget, least recently used going first.
+#
+#   PAPERMAP_BOUNDARY_CACHE_MB   budget for cached levels and partitions (default: 128)
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+from utils.metrics import count, timed
+
+logger = logging.getLogger(__name__)
+
+STATE_SHAPEFILE_PATH = "data/India_State_Boundary_UPPERCASE.shp"
+DISTRICT_SHAPEFILE_PATH = "data/DISTRICT_BOUNDARY_CLEANED.shp"
+
+GEOGRAPHIC_CRS = "EPSG:4326"
+WEB_MERCATOR_CRS = "EPSG:3857"
+
+CONVERTED_DIR = "data/arrow"
+CONVERTED_CRS = (GEOGRAPHIC_CRS, WEB_MERCATOR_CRS)
+
+PYRAMID_DIR = "data/pyramids"
+# Simplification tolerances in degrees, finest first (about 50 m to 3 km)
+PYRAMID_TOLERANCES = (0.0005, 0.002, 0.008, 0.03)
+
+PARTITION_DIR = "data/partitions"
+PARTITION_MANIFEST = "manifest.json"
+
+BOUNDARY_CACHE_MB = float(os.environ.get("PAPERMAP_BOUNDARY_CACHE_MB", 128))
+
+_lock = threading.Lock()
+_layers = OrderedDict()  # abspath -> {"mtime_ns", "frames": {crs: gdf}, "stats": {crs: {...}}}, least recently used first
+_manifests = {}  # manifest abspath -> (mtime_ns, manifest)
+
+
+def _frame_nbytes(gdf):
+    # memory_usage() only counts the pointer array of the geometry column,
+    # so add 16 bytes per coordinate pair for the GEOS-side vertices.
+    attrs = gdf.drop(columns=gdf.geometry.name).memory_usage(deep=True).sum()
+    coords = shapely.get_num_coordinates(gdf.geometry.values).sum()
+    return int(attrs + gdf.geometry.memory_usage() + coords * 16)
+
+
+def converted_path(path, crs):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CONVERTED_DIR, f"{stem}.{crs.replace(':', '').lower()}.arrow")
+
+
+def _converted(path, crs):
+    """Converted copy of `path` in `crs`, unless missing or older than `path` (which may be absent)."""
+    converted = converted_path(path, crs)
+    if not os.path.exists(converted):
+        return None
+    if os.path.exists(path) and os.stat(converted).st_mtime_ns < os.stat(path).st_mtime_ns:
+        return None
+    return converted
+
+
+def _mtime_ns(path):
+    if not os.path.exists(path):
+        # Deployments may ship only the converted copy of a shapefile
+        converted = converted_path(path, GEOGRAPHIC_CRS)
+        if os.path.exists(converted):
+            path = converted
+    return os.stat(path).st_mtime_ns
+
+
+def _read(abspath):
+    if abspath.endswith(".parquet"):
+        return gpd.read_parquet(abspath)
+    return gpd.read_file(abspath)
+
+
+def _geo_metadata(schema):
+    """The schema's GeoParquet-style "geo" metadata, or {} if it has none."""
+    try:
+        return json.loads((schema.metadata or {})[b"geo"])
+    except (KeyError, ValueError):
+        return {}
+
+
+def _geometry_column(schema):
+    # The "geo" metadata names the primary column; otherwise take the first
+    # GeoArrow extension field (as written by GeoDataFrame.to_arrow)
+    primary = _geo_metadata(schema).get("primary_column")
+    if primary in schema.names:
+        return primary
+    for field in schema:
+        if (field.metadata or {}).get(b"ARROW:extension:name", b"").startswith(b"geoarrow."):
+            return field.name
+    raise ValueError("no geometry column in Arrow schema")
+
+
+def read_arrow(path):
+    """
+    GeoDataFrame of a converted (uncompressed Arrow IPC) layer. The attribute
+    columns are pandas ArrowDtype views of the memory-mapped file, so they stay
+    in the OS page cache shared by every process. The geometries are decoded
+    into GEOS objects owned by this process, and they are most of a layer's
+    memory.
+    """
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    geometry = _geometry_column(table.schema)
+    attrs = table.drop_columns([geometry]).to_pandas(types_mapper=pd.ArrowDtype)
+    geoms = gpd.GeoDataFrame.from_arrow(table.select([geometry])).geometry
+    return gpd.GeoDataFrame(attrs, geometry=geoms)
+
+
+@timed("boundary.load")
+def _load(path, crs):
+    abspath = os.path.abspath(path)
+    mtime_ns = _mtime_ns(abspath)
+    entry = _layers.get(abspath)
+    if entry is None or entry["mtime_ns"] != mtime_ns:
+        entry = {"mtime_ns": mtime_ns, "frames": {}, "stats": {}}
+        _layers[abspath] = entry
+    _layers.move_to_end(abspath)
+
+    if crs in entry["frames"]:
+        return entry["frames"][crs]
+
+    start = time.perf_counter()
+    converted = _converted(path, crs)
+    if converted is not None:
+        gdf = read_arrow(converted)
+    elif crs == GEOGRAPHIC_CRS:
+        gdf = _read(abspath).to_crs(GEOGRAPHIC_CRS)
+    else:
+        gdf = _load(path, GEOGRAPHIC_CRS).to_crs(crs)
+    elapsed = time.perf_counter() - start
+
+    entry["frames"][crs] = _freeze(gdf)
+    entry["stats"][crs] = {
+        "rows": len(gdf),
+        "bytes": _frame_nbytes(gdf),
+        "load_seconds": elapsed,
+    }
+    logger.info("Loaded %s in %s: %d rows, %.1f MB, %.2fs", converted or path, crs, len(gdf),
+                entry["stats"][crs]["bytes"] / 1e6, elapsed)
+    _trim(keep=abspath)
+    return gdf
+
+
+def _freeze(gdf):
+    # Copy-on-write already keeps other columns of a shallow copy from
+    # writing through, and Arrow-backed columns are immutable; a geometry
+    # column is a plain object array shared by every copy
+    for name, dtype in gdf.dtypes.items():
+        if dtype.name == "geometry":
+            np.asarray(gdf[name].array).flags.writeable = False
+    return gdf
+
+
+def _is_full_layer(abspath):
+    return abspath in (os.path.abspath(STATE_SHAPEFILE_PATH), os.path.abspath(DISTRICT_SHAPEFILE_PATH))
+
+
+def _trim(keep):
+    # Evicts the least recently used levels and partitions (never the full
+    # layers, nor `keep`, the one just loaded) until they fit the budget.
+    evictable = [path for path in _layers if not _is_full_layer(path) and path != keep]
+    held = sum(sum(s["bytes"] for s in _layers[path]["stats"].values())
+               for path in _layers if not _is_full_layer(path))
+    while held > BOUNDARY_CACHE_MB * 1e6 and evictable:
+        path = evictable.pop(0)
+        held -= sum(s["bytes"] for s in _layers.pop(path)["stats"].values())
+        count("boundary.evict")
+        logger.debug("Evicted %s from the boundary cache", path)
+
+
+def pyramid_path(path, tolerance):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(PYRAMID_DIR, f"{stem}_tol{tolerance:g}.parquet")
+
+
+def pyramid_level(path, pixel_size):
+    """
+    Path of the coarsest simplified copy of `path` whose tolerance does not
+    exceed `pixel_size` (degrees per output pixel), or None when no built,
+    up-to-date level qualifies.
+    """
+    source_mtime = _mtime_ns(path)
+    best = None
+    for tolerance in PYRAMID_TOLERANCES:
+        if tolerance > pixel_size:
+            break
+        level = pyramid_path(path, tolerance)
+        if os.path.exists(level) and _mtime_ns(level) >= source_mtime:
+            best = level
+    return best
+
+
+def get_layer(path, crs=GEOGRAPHIC_CRS, pixel_size=None):
+    """
+    Returns the boundary layer at `path` in `crs`, parsing and reprojecting it
+    only the first time it is requested in this process (or after the file on
+    disk changes). With `pixel_size` (degrees per output pixel) the coarsest
+    simplified level that stays within a pixel is returned instead, if one
+    has been built. The result is a shallow copy of the shared frame: columns
+    can be added, dropped or assigned, but the shared values are read-only
+    (writing into the geometry array raises ValueError).
+    """
+    if pixel_size is not None:
+        path = pyramid_level(path, pixel_size) or path
+    with _lock:
+        gdf = _load(path, crs)
+    return gdf.copy(deep=False)
+
+
+def layer_bounds(path):
+    """
+    [minx, miny, maxx, maxy] of the layer at `path` in lon/lat. Read from the
+    converted copy's metadata when there is one, so no geometries are loaded;
+    otherwise from the cached layer.
+    """
+    converted = _converted(path, GEOGRAPHIC_CRS)
+    if converted is not None:
+        with pa.memory_map(converted) as source:
+            geo = _geo_metadata(pa.ipc.open_file(source).schema)
+        bbox = geo.get("columns", {}).get(geo.get("primary_column"), {}).get("bbox")
+        if bbox is not None:
+            return list(bbox)
+    with _lock:
+        return _load(path, GEOGRAPHIC_CRS).total_bounds.tolist()
+
+
+def get_states(crs=GEOGRAPHIC_CRS, pixel_size=None):
+    return get_layer(STATE_SHAPEFILE_PATH, crs, pixel_size)
+
+
+def get_districts(crs=GEOGRAPHIC_CRS, pixel_size=None):
+    return get_layer(DISTRICT_SHAPEFILE_PATH, crs, pixel_size)
+
+
+def partition_dir(path):
+    """Directory holding the per-state partitions of the district layer at `path`."""
+    return os.path.join(PARTITION_DIR, os.path.splitext(os.path.basename(path))[0])
+
+
+def partition_manifest(path):
+    """
+    Manifest of the per-state partitions of `path`, or None if they have not
+    been built or predate the layer. Maps `"states"` to
+    `{state: {"file", "count", "bounds", "districts": {district: bounds}}}`.
+    """
+    manifest_path = os.path.abspath(os.path.join(partition_dir(path), PARTITION_MANIFEST))
+    try:
+        mtime_ns = _mtime_ns(manifest_path)
+    except OSError:
+        return None
+    with _lock:
+        cached = _manifests.get(manifest_path)
+        if cached is None or cached[0] != mtime_ns:
+            with open(manifest_path) as f:
+                cached = (mtime_ns, json.load(f))
+            _manifests[manifest_path] = cached
+    manifest = cached[1]
+    return manifest if manifest.get("source_mtime_ns") == _mtime_ns(path) else None
+
+
+def get_state_districts(state, crs=GEOGRAPHIC_CRS, pixel_size=None):
+    """
+    Districts of `state`, read from its partition when one is built (at the
+    pyramid level matching `pixel_size`, as in `get_layer`), otherwise
+    filtered from the national layer.
+    """
+    path = DISTRICT_SHAPEFILE_PATH
+    if pixel_size is not None:
+        path = pyramid_level(path, pixel_size) or path
+    manifest = partition_manifest(path)
+    entry = manifest["states"].get(state) if manifest else None
+    if entry is None:
+        gdf = get_layer(path, crs)
+        return gdf[gdf['STATE'] == state]
+    return get_layer(os.path.join(partition_dir(path), entry["file"]), crs)
+
+
+def district_bounds(state, districts=None):
+    """
+    [minx, miny, maxx, maxy] of `state`'s districts (or of the named
+    `districts` in it), from the partition manifest when available; None if
+    nothing matches.
+    """
+    manifest = partition_manifest(DISTRICT_SHAPEFILE_PATH)
+    if manifest is None:
+        gdf = get_state_districts(state)
+        if districts is not None:
+            gdf = gdf[gdf['District'].isin(districts)]
+        return None if gdf.empty else gdf.total_bounds.tolist()
+    entry = manifest["states"].get(state)
+    if entry is None:
+        return None
+    if districts is None:
+        return entry["bounds"]
+    boxes = [entry["districts"][d] for d in districts if d in entry["districts"]]
+    if not boxes:
+        return None
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def layer_version(path):
+    """Token that changes whenever the cached layer at `path` is reloaded."""
+    return (os.path.abspath(path), _mtime_ns(path))
+
+
+def data_version(path):
+    """
+    Token that changes whenever the layer at `path`, one of its simplified
+    levels or its partitions (with their manifest) are rebuilt.
+    """
+    token = []
+    for level in [path] + [pyramid_path(path, tolerance) for tolerance in PYRAMID_TOLERANCES]:
+        for file in (level, os.path.join(partition_dir(level), PARTITION_MANIFEST)):
+            try:
+                token.append(_mtime_ns(file))
+            except OSError:
+                token.append(None)
+    return token
+
+
+def store_stats():
+    """One row per cached (layer, CRS) with row count, approximate bytes and load time."""
+    with _lock:
+        return [
+            {"path": path, "crs": crs, **stats}
+            for path, entry in _layers.items()
+            for crs, stats in entry["stats"].items()
+        ]
+
+
+def total_bytes():
+    return sum(row["bytes"] for row in store_stats())
+
+
+def clear():
+    with _lock:
+        _layers.clear()
+        _manifests.clear()
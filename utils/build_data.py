@@ -0,0 +1,186 @@
+# utils/build_data.py
+#
+# Offline build steps for the bundled boundary data. Run after replacing the
+# shapefiles in data/:
+#
+#   python -m utils.build_data convert
+#   python -m utils.build_data pyramids
+#   python -m utils.build_data partitions
+#   python -m utils.build_data india-overview
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import shapely
+import shapely.errors
+
+from utils.boundary_store import (
+    CONVERTED_CRS, CONVERTED_DIR, DISTRICT_SHAPEFILE_PATH, PARTITION_MANIFEST, PYRAMID_DIR,
+    PYRAMID_TOLERANCES, STATE_SHAPEFILE_PATH, converted_path, get_layer, layer_version, partition_dir,
+    pyramid_path,
+)
+from utils.overview_maps import OVERVIEW_DIR, build_india_layers
+
+logger = logging.getLogger(__name__)
+
+LAYERS = {
+    "states": STATE_SHAPEFILE_PATH,
+    "districts": DISTRICT_SHAPEFILE_PATH,
+}
+
+
+# --- Arrow IPC conversion ---
+GEOARROW_TYPES = {
+    "point": "Point", "linestring": "LineString", "polygon": "Polygon",
+    "multipoint": "MultiPoint", "multilinestring": "MultiLineString", "multipolygon": "MultiPolygon",
+}
+
+
+def geo_metadata(gdf, table):
+    """
+    GeoParquet 1.1 "geo" metadata for `table`, the GeoArrow-encoded `gdf`.
+    `to_arrow` leaves it out; the app reads the layer bounds from its bbox,
+    and `gpd.read_feather` needs it to open the file.
+    """
+    name = gdf.geometry.name
+    encoding = table.schema.field(name).metadata[b"ARROW:extension:name"].decode().split(".", 1)[1]
+    column = {
+        "encoding": encoding,
+        "geometry_types": [GEOARROW_TYPES[encoding]],  # native encodings hold a single type
+        "bbox": [float(v) for v in gdf.total_bounds],
+    }
+    if gdf.crs is not None:
+        column["crs"] = gdf.crs.to_json_dict()
+    return json.dumps({"version": "1.1.0", "primary_column": name, "columns": {name: column}})
+
+
+def convert_layer(path):
+    """
+    Writes `path` once per CONVERTED_CRS as uncompressed Arrow IPC (Feather v2)
+    with GeoArrow-native geometry, so the app can memory-map it instead of
+    parsing the shapefile and reprojecting. Native coordinate arrays decode
+    about twice as fast as WKB.
+    """
+    os.makedirs(CONVERTED_DIR, exist_ok=True)
+    for crs in CONVERTED_CRS:
+        gdf = get_layer(path, crs)
+        out = converted_path(path, crs)
+        table = pa.table(gdf.to_arrow(geometry_encoding="geoarrow"))
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"geo": geo_metadata(gdf, table)})
+        # The layer may have been memory-mapped from `out` itself: write a new
+        # file and swap it in, leaving the mapped one intact
+        tmp = f"{out}.{os.getpid()}.tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, out)
+        print(f"{path} ({crs}): {len(gdf)} features -> {out} ({os.path.getsize(out) / 1e6:.1f} MB)")
+
+
+# --- Simplified boundary pyramids ---
+def simplify_layer(gdf, tolerance):
+    """
+    Simplifies every polygon in `gdf` to within `tolerance`. Shared borders
+    are simplified once with `shapely.coverage_simplify` so neighbours stay
+    gap-free; without GEOS 3.12, or if the layer is not a clean coverage,
+    each polygon is simplified on its own with topology preserved.
+    """
+    out = gdf.copy()
+    try:
+        out.geometry = shapely.coverage_simplify(gdf.geometry.values, tolerance)
+    except (AttributeError, shapely.errors.UnsupportedGEOSVersionError, shapely.errors.GEOSException) as e:
+        logger.warning("Coverage simplification unavailable (%s); simplifying polygons independently", e)
+        out.geometry = gdf.geometry.simplify(tolerance, preserve_topology=True)
+    return out
+
+
+def build_pyramids(paths, tolerances=PYRAMID_TOLERANCES):
+    os.makedirs(PYRAMID_DIR, exist_ok=True)
+    for path in paths:
+        gdf = get_layer(path)
+        full = int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+        print(f"{path}: {len(gdf)} features, {full:,} vertices")
+        for tolerance in tolerances:
+            start = time.perf_counter()
+            level = simplify_layer(gdf, tolerance)
+            out = pyramid_path(path, tolerance)
+            level.to_parquet(out)
+            kept = int(shapely.get_num_coordinates(level.geometry.values).sum())
+            print(f"  tolerance {tolerance:g}°: {kept:,} vertices ({kept / full:.1%}) -> {out} "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+
+# --- Per-state district partitions ---
+def _bounds(gdf):
+    return [float(v) for v in gdf.total_bounds]
+
+
+def build_partitions(path):
+    """
+    Writes one GeoParquet file per STATE of the district layer at `path`, and
+    a manifest with each state's feature count and bounds and each
+    district's bounds.
+    """
+    gdf = get_layer(path)
+    out_dir = partition_dir(path)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"source_mtime_ns": layer_version(path)[1], "states": {}}
+    for state, part in gdf.groupby('STATE', sort=True):
+        filename = re.sub(r"[^A-Za-z0-9]+", "_", str(state)).strip("_") + ".parquet"
+        part = part.reset_index(drop=True)
+        part.to_parquet(os.path.join(out_dir, filename))
+        manifest["states"][state] = {
+            "file": filename,
+            "count": len(part),
+            "bounds": _bounds(part),
+            "districts": {str(name): _bounds(rows) for name, rows in part.groupby('District', sort=True)},
+        }
+    with open(os.path.join(out_dir, PARTITION_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+    print(f"{path}: {len(gdf)} districts in {len(manifest['states'])} state partitions -> {out_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.build_data")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="write the boundary layers as memory-mappable Arrow IPC")
+    conv.add_argument("--layer", choices=["all"] + list(LAYERS), default="all")
+
+    pyr = sub.add_parser("pyramids", help="write simplified copies of the boundary layers")
+    pyr.add_argument("--layer", choices=["all"] + list(LAYERS), default="all")
+    pyr.add_argument("--tolerances", nargs="+", type=float, default=list(PYRAMID_TOLERANCES),
+                     help="degrees; the app only uses levels listed in PYRAMID_TOLERANCES")
+
+    sub.add_parser("partitions", help="split the district layer (and its pyramid levels) by state")
+
+    india = sub.add_parser("india-overview", help="prerender the India overview base and per-state highlights")
+    india.add_argument("--out-dir", default=OVERVIEW_DIR)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "convert":
+        names = list(LAYERS) if args.layer == "all" else [args.layer]
+        for name in names:
+            convert_layer(LAYERS[name])
+    elif args.command == "pyramids":
+        names = list(LAYERS) if args.layer == "all" else [args.layer]
+        build_pyramids([LAYERS[name] for name in names], args.tolerances)
+    elif args.command == "partitions":
+        levels = [pyramid_path(DISTRICT_SHAPEFILE_PATH, t) for t in PYRAMID_TOLERANCES]
+        for path in [DISTRICT_SHAPEFILE_PATH] + [p for p in levels if os.path.exists(p)]:
+            build_partitions(path)
+    elif args.command == "india-overview":
+        start = time.perf_counter()
+        manifest = build_india_layers(args.out_dir)
+        print(f"India base + {len(manifest['states'])} state highlights -> {args.out_dir} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
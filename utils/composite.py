@@ -0,0 +1,251 @@
+# utils/composite.py
+#
+# Composite layout for page 03. A template places the four map panels on a
+# grid; the layout is computed from the PNG headers alone, then each panel is
+# decoded once, resized straight to its target size and pasted onto a single
+# canvas, which is encoded once.
+
+import io
+
+from PIL import Image
+
+from utils.metrics import timed
+
+PANELS = ("india_map", "state_map", "district_map", "study_area_map")
+
+# col_widths are pixels (before any requested width); cells are (row, col) or
+# (row, col, rowspan, colspan). A column holding a single spanning panel
+# stretches so that panel fills the height of its rows.
+LAYOUT_TEMPLATES = {
+    "Overviews left": dict(col_widths=(300, 700), cells={
+        "india_map": (0, 0), "state_map": (1, 0), "district_map": (2, 0),
+        "study_area_map": (0, 1, 3, 1),
+    }),
+    "Overviews right": dict(col_widths=(700, 300), cells={
+        "study_area_map": (0, 0, 3, 1),
+        "india_map": (0, 1), "state_map": (1, 1), "district_map": (2, 1),
+    }),
+    "Overviews below": dict(col_widths=(334, 333, 333), cells={
+        "study_area_map": (0, 0, 1, 3),
+        "india_map": (1, 0), "state_map": (1, 1), "district_map": (1, 2),
+    }),
+    "Grid 2×2": dict(col_widths=(500, 500), cells={
+        "study_area_map": (0, 0), "india_map": (0, 1),
+        "state_map": (1, 0), "district_map": (1, 1),
+    }),
+}
+DEFAULT_TEMPLATE = "Overviews left"
+
+
+def _cell(spec):
+    row, col, rowspan, colspan = (tuple(spec) + (1, 1))[:4]
+    return row, col, rowspan, colspan
+
+
+def panel_sizes(panels):
+    """(width, height) of each PNG in `panels`, read from the header only."""
+    return {name: Image.open(io.BytesIO(png)).size for name, png in panels.items()}
+
+
+# --- Layout ---
+def compute_layout(template, sizes, width=None):
+    """
+    Canvas size and each panel's (x, y, w, h) box for `template` (a name or a
+    template dict) given the panels' pixel `sizes`. `width` scales the
+    finished layout to that canvas width.
+    """
+    if isinstance(template, str):
+        template = LAYOUT_TEMPLATES[template]
+    cells = {name: _cell(spec) for name, spec in template["cells"].items() if name in sizes}
+    col_widths = [float(w) for w in template["col_widths"]]
+    n_rows = max(row + rowspan for row, _, rowspan, _ in cells.values())
+
+    def natural_height(name, widths):
+        _, col, _, colspan = cells[name]
+        w, h = sizes[name]
+        return sum(widths[col:col + colspan]) * h / w
+
+    # Rows take the height of their single-row panels; spanning panels that
+    # need more grow their rows evenly
+    row_heights = [0.0] * n_rows
+    for name, (row, _, rowspan, _) in cells.items():
+        if rowspan == 1:
+            row_heights[row] = max(row_heights[row], natural_height(name, col_widths))
+    for name, (row, _, rowspan, _) in cells.items():
+        if rowspan > 1:
+            extra = natural_height(name, col_widths) - sum(row_heights[row:row + rowspan])
+            if extra > 0:
+                for r in range(row, row + rowspan):
+                    row_heights[r] += extra / rowspan
+
+    # A panel that owns its columns outright widens them to fill its rows
+    for name, (row, col, rowspan, colspan) in cells.items():
+        owners = {other for other, (_, c, _, cs) in cells.items() if c < col + colspan and col < c + cs}
+        if rowspan > 1 and owners == {name}:
+            factor = sum(row_heights[row:row + rowspan]) / natural_height(name, col_widths)
+            for c in range(col, col + colspan):
+                col_widths[c] *= factor
+
+    if width is not None:
+        factor = width / sum(col_widths)
+        col_widths = [w * factor for w in col_widths]
+        row_heights = [h * factor for h in row_heights]
+
+    xs = [sum(col_widths[:c]) for c in range(len(col_widths) + 1)]
+    ys = [sum(row_heights[:r]) for r in range(n_rows + 1)]
+    boxes = {}
+    for name, (row, col, rowspan, colspan) in cells.items():
+        cell_w = xs[col + colspan] - xs[col]
+        cell_h = ys[row + rowspan] - ys[row]
+        w, h = sizes[name]
+        scale = min(cell_w / w, cell_h / h)
+        box_w, box_h = max(1, round(w * scale)), max(1, round(h * scale))
+        x = round(xs[col] + (cell_w - box_w) / 2)
+        y = round(ys[row] + (cell_h - box_h) / 2)
+        boxes[name] = (x, y, box_w, box_h)
+    canvas = (max(1, round(xs[-1])), max(1, round(ys[-1])))
+    return canvas, boxes
+
+
+# --- Composition ---
+@timed("composite.compose")
+def compose(panels, template=DEFAULT_TEMPLATE, width=None, background="white"):
+    """
+    Composite PIL image of `panels` (name -> PNG bytes). Only the canvas and
+    one decoded panel are held in memory at a time.
+    """
+    canvas_size, boxes = compute_layout(template, panel_sizes(panels), width)
+    canvas = Image.new("RGB", canvas_size, background)
+    for name, (x, y, w, h) in boxes.items():
+        with Image.open(io.BytesIO(panels[name])) as im:
+            im = im.convert("RGBA") if im.mode in ("RGBA", "LA", "P") else im.convert("RGB")
+            if im.size != (w, h):
+                im = im.resize((w, h), Image.LANCZOS, reducing_gap=3.0)
+            canvas.paste(im, (x, y), im if im.mode == "RGBA" else None)
+    return canvas
+
+
+def compose_png(panels, template=DEFAULT_TEMPLATE, width=None):
+    canvas = compose(panels, template, width)
+    buf = io.BytesIO()
+    with timed("composite.encode_png"):
+        canvas.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+# --- Vector composition ---
+VECTOR_FORMATS = {"PDF": "pdf", "SVG": "svg", "EPS": "eps"}
+VECTOR_MIMES = {"pdf": "application/pdf", "svg": "image/svg+xml", "eps": "application/postscript"}
+VECTOR_PANEL_PAD_PT = 3  # slack around each panel; text extents grow slightly when scaled down
+
+
+def panel_inches(panels):
+    """Native (width, height) in inches of each PNG in `panels`, from its size and dpi."""
+    out = {}
+    for name, png in panels.items():
+        with Image.open(io.BytesIO(png)) as im:
+            dpi = im.info.get("dpi", (100, 100))[0] or 100
+            out[name] = (im.width / dpi, im.height / dpi)
+    return out
+
+
+def _scale_ticks(ax, s):
+    """Scales tick length, width and pad (labels are handled with the other text); returns the tick lines."""
+    lines = set()
+    for axis in (ax.xaxis, ax.yaxis):
+        axis.labelpad *= s
+        for which, ticks in (("major", axis.get_major_ticks(len(axis.get_majorticklocs()))),
+                             ("minor", axis.get_minor_ticks(len(axis.get_minorticklocs())))):
+            if not ticks:
+                continue
+            line = ticks[0].tick1line
+            axis.set_tick_params(which=which, length=line.get_markersize() * s,
+                                 width=line.get_markeredgewidth() * s, pad=ticks[0].get_pad() * s)
+            for tick in ticks:
+                lines.update((tick.tick1line, tick.tick2line))
+    return lines
+
+
+def scale_artists(ax, s):
+    """
+    Scales everything sized in points on `ax` (and its secondary axes) by `s`:
+    text, line widths, markers, ticks, scatter sizes, glyph label paths and
+    offset images. Data-space geometry is left alone.
+    """
+    from matplotlib.collections import Collection
+    from matplotlib.lines import Line2D
+    from matplotlib.offsetbox import OffsetImage
+    from matplotlib.patches import Patch
+    from matplotlib.text import Text
+    from matplotlib.transforms import Affine2D, IdentityTransform
+
+    tick_lines = set()
+    for a in [ax, *ax.child_axes]:
+        tick_lines |= _scale_ticks(a, s)
+    for artist in set(ax.findobj()):
+        if isinstance(artist, Text):
+            artist.set_fontsize(artist.get_fontsize() * s)
+        elif isinstance(artist, Line2D) and artist not in tick_lines:
+            artist.set_linewidth(artist.get_linewidth() * s)
+            artist.set_markersize(artist.get_markersize() * s)
+            artist.set_markeredgewidth(artist.get_markeredgewidth() * s)
+        elif isinstance(artist, Patch):
+            artist.set_linewidth(artist.get_linewidth() * s)
+        elif isinstance(artist, Collection):
+            artist.set_linewidths(artist.get_linewidths() * s)
+            transform = artist.get_transform()
+            if len(getattr(artist, "get_sizes", lambda: [])()):
+                artist.set_sizes(artist.get_sizes() * s * s)
+            elif not isinstance(transform, IdentityTransform) and not transform.contains_branch(ax.transData):
+                artist.set_transform(Affine2D().scale(s) + transform)  # point-sized paths (glyph labels)
+        elif isinstance(artist, OffsetImage):
+            artist.set_zoom(artist.get_zoom() * s)
+
+
+def _fit_axes(fig, ax, box):
+    """Positions `ax` so its tight bbox, tick labels included, fits `box` (figure pixels)."""
+    renderer = fig.canvas.get_renderer()
+    ax.apply_aspect()
+    tight = ax.get_tightbbox(renderer)
+    active = ax.bbox
+    left, bottom = active.x0 - tight.x0, active.y0 - tight.y0
+    right, top = tight.x1 - active.x1, tight.y1 - active.y1
+    x0, y0, w, h = box
+    rect = (x0 + left, y0 + bottom, max(1.0, w - left - right), max(1.0, h - bottom - top))
+    fig_w, fig_h = fig.bbox.width, fig.bbox.height
+    ax.set_position([rect[0] / fig_w, rect[1] / fig_h, rect[2] / fig_w, rect[3] / fig_h])
+
+
+@timed("composite.compose_vector")
+def compose_vector(panels, painters, template=DEFAULT_TEMPLATE, width_in=7.2, fmt="pdf", raster_dpi=300):
+    """
+    Vector composite: each painter `(draw, args)` redraws its panel into one
+    matplotlib figure, laid out like `compose` from the panel PNGs' sizes.
+    Every panel is drawn at its native size (so label thinning and point
+    aggregation match the PNG), then shrunk with its point-sized artists to
+    the box. Only images (the basemap) stay raster, at `raster_dpi`.
+    """
+    import matplotlib
+
+    from utils.figures import figure
+
+    native = panel_inches(panels)
+    ppi = 72.0
+    (canvas_w, canvas_h), boxes = compute_layout(template, panel_sizes(panels), width_in * ppi)
+    with figure((canvas_w / ppi, canvas_h / ppi), ppi) as fig:
+        for name, (x, y, w, h) in boxes.items():
+            draw, args = painters[name]
+            s = (w / ppi) / native[name][0]
+            pad = VECTOR_PANEL_PAD_PT
+            box = (x + pad, canvas_h - y - h + pad, w - 2 * pad, h - 2 * pad)  # layout is top-down, matplotlib bottom-up
+            fig.set_size_inches(canvas_w / ppi / s, canvas_h / ppi / s)
+            ax = fig.add_axes([box[0] / canvas_w, box[1] / canvas_h, box[2] / canvas_w, box[3] / canvas_h])
+            draw(ax, *args)
+            for _ in range(2):
+                _fit_axes(fig, ax, tuple(v / s for v in box))
+            fig.set_size_inches(canvas_w / ppi, canvas_h / ppi)
+            scale_artists(ax, s)
+        buf = io.BytesIO()
+        with matplotlib.rc_context({"pdf.fonttype": 42, "ps.fonttype": 42}), timed("composite.vector_savefig"):
+            fig.savefig(buf, format=fmt, dpi=raster_dpi)
+    return buf.getvalue()
@@ -0,0 +1,163 @@
+# utils/coords.py
+
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.metrics import timed
+
+
+# --- Robust latitude/longitude parser ---
+def parse_latlon(val):
+    """
+    Converts a wide range of latitude/longitude string formats to decimal degrees float.
+    Supports:
+      - Decimal degrees: 9.9732, -9.9732, 9.9732N, 76.2821E, etc.
+      - DMS: 9°58'23"N, 76°16'56"E, 9 58 23 N, 9:58:23S, etc.
+      - Degrees and decimal minutes: 9°58.383'N, 76 16.934 W, etc.
+      - Any whitespace, delimiter or symbol
+    Returns NaN if format is unrecognized.
+    """
+    if isinstance(val, (float, int)) and not isinstance(val, bool):
+        return float(val)
+    if not isinstance(val, str):
+        return np.nan
+
+    s = val.strip().replace(" ", "").replace("º", "°").replace("’", "'").replace("”", '"').replace("′", "'").replace("″", '"')
+
+    # Decimal degrees with direction (e.g., 9.9732N, 76.2821W)
+    m = re.match(r"^([-+]?\d+(?:\.\d+)?)([NSEW])?$", s, re.IGNORECASE)
+    if m:
+        num = float(m.group(1))
+        direction = m.group(2)
+        if direction:
+            if direction.upper() in ['S', 'W']:
+                num = -abs(num)
+            else:
+                num = abs(num)
+        return num
+
+    # DMS or DM with possible direction: e.g., 9°58'23"N, 9:58:23N, 76°16.934'W
+    dms_pattern = (
+        r"^([-\d\.]+)[°:]([-\d\.]+)?[':]?([-\d\.]+)?\"?([NSEW])?$"
+    )
+    m = re.match(dms_pattern, s, re.IGNORECASE)
+    if m:
+        deg = float(m.group(1))
+        min_ = float(m.group(2)) if m.group(2) else 0
+        sec = float(m.group(3)) if m.group(3) else 0
+        direction = m.group(4)
+        num = abs(deg) + min_ / 60 + sec / 3600
+        if deg < 0:  # preserve negative degrees
+            num = -num
+        if direction:
+            if direction.upper() in ['S', 'W']:
+                num = -abs(num)
+            else:
+                num = abs(num)
+        return num
+
+    # Space or colon separated: "9 58 23N" or "9:58:23N"
+    m = re.match(r"^([-\d\.]+)[ :]+([-\d\.]+)(?:[ :]+([-\d\.]+))?([NSEW])?$", val.replace("º", "°"), re.IGNORECASE)
+    if m:
+        deg = float(m.group(1))
+        min_ = float(m.group(2))
+        sec = float(m.group(3)) if m.group(3) else 0
+        direction = m.group(4)
+        num = abs(deg) + min_ / 60 + sec / 3600
+        if deg < 0:
+            num = -num
+        if direction:
+            if direction.upper() in ['S', 'W']:
+                num = -abs(num)
+            else:
+                num = abs(num)
+        return num
+
+    # Single degree with direction: "9N", "76E"
+    m = re.match(r"^(\d+)([NSEW])$", s, re.IGNORECASE)
+    if m:
+        num = float(m.group(1))
+        direction = m.group(2)
+        if direction.upper() in ['S', 'W']:
+            num = -abs(num)
+        else:
+            num = abs(num)
+        return num
+
+    # Fallback: try to parse as float
+    try:
+        return float(val)
+    except Exception:
+        return np.nan
+
+
+# --- Vectorized column parser ---
+# One precompiled pattern covers every accepted notation; which groups matched
+# classifies the cell: degrees only (decimal, optionally with hemisphere),
+# degrees + minutes (DM) or degrees + minutes + seconds (DMS). It is run by
+# Arrow's RE2 engine over the whole column, so there is no per-cell Python
+# (pandas' `.str.extract` with the same pattern is about four times slower).
+LATLON_PATTERN = (
+    r"^\s*(?P<deg>[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+    r"(?:"
+    r"\s*[°º:\s]\s*(?P<min>\d+(?:\.\d+)?)"
+    r"(?:\s*['’′:\s]\s*(?P<sec>\d+(?:\.\d+)?)\s*(?:''|[\"”″])?|\s*['’′])?"
+    r"|\s*[°º]"
+    r")?"
+    r"\s*(?P<hemi>[NSEWnsew])?\s*$"
+)
+
+
+def _number(matches, name):
+    # RE2 reports optional groups that did not take part in the match as "".
+    values = pc.struct_field(matches, name)
+    values = pc.if_else(pc.equal(values, ""), pa.scalar(None, pa.string()), values)
+    return pc.cast(values, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+@timed("coords.parse_latlon_series")
+def parse_latlon_series(values):
+    """
+    Column-level counterpart of `parse_latlon`.
+    Numeric columns take a fast path; anything else is matched against
+    `LATLON_PATTERN` in a single vectorized pass and the degree/minute/second
+    arithmetic runs on whole arrays.
+    Returns `(parsed, failed)`: a float Series and a boolean mask of the rows
+    that could not be parsed (including empty cells), both on the input index.
+    Unlike `parse_latlon`, spaces separate the parts of DMS/DM cells instead
+    of being dropped ("9 58 23 N" is 9.973, not 95823), "''" is accepted for
+    seconds, and minus zero degrees keeps its sign ("-0°30'" is -0.5).
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_bool_dtype(s):
+        parsed = pd.Series(np.nan, index=s.index)
+        return parsed, parsed.isna()
+    if pd.api.types.is_numeric_dtype(s):
+        parsed = s.astype(float)
+        return parsed, parsed.isna()
+
+    missing = s.isna().to_numpy()
+    if pd.api.types.infer_dtype(s, skipna=True) != "string":
+        # Mixed cells (e.g. Excel numbers next to DMS text): numbers
+        # round-trip exactly through their repr, bools fail the pattern.
+        s = s.astype(str)
+    text = pa.array(s.to_numpy(dtype=object), type=pa.string(), mask=missing)
+    matches = pc.extract_regex(text, LATLON_PATTERN)
+
+    deg = _number(matches, "deg")
+    magnitude = (
+        np.abs(deg)
+        + np.nan_to_num(_number(matches, "min")) / 60
+        + np.nan_to_num(_number(matches, "sec")) / 3600
+    )
+    hemisphere = pc.utf8_upper(pc.struct_field(matches, "hemi"))
+    has_hemisphere = pc.not_equal(hemisphere, "").to_numpy(zero_copy_only=False)
+    southern_or_western = pc.is_in(hemisphere, pa.array(["S", "W"])).to_numpy(zero_copy_only=False)
+    negative = np.where(has_hemisphere, southern_or_western, np.signbit(deg))
+
+    parsed = pd.Series(np.where(negative, -magnitude, magnitude), index=s.index)
+    return parsed, parsed.isna()
@@ -0,0 +1,112 @@
+# utils/figures.py
+#
+# Matplotlib figures for every map render. Figures are built with the
+# object-oriented `Figure` API on an Agg canvas, so they never enter pyplot's
+# global figure registry (which keeps each figure alive until `plt.close`),
+# and they are always cleared when the `with` block ends. Renders of a fixed
+# size can hand their figure back to a small pool, so the next render reuses
+# its canvas and pixel buffer instead of allocating new ones.
+#
+#   PAPERMAP_FIGURE_POOL   idle figures kept per (size, dpi) (default: 1; 0 disables reuse)
+
+import contextlib
+import os
+import sys
+import threading
+import weakref
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+FIGURE_POOL_SIZE = int(os.environ.get("PAPERMAP_FIGURE_POOL", 1))
+
+_lock = threading.Lock()
+_pool = {}  # (figsize, dpi) -> idle figures
+_alive = weakref.WeakSet()  # every figure made here that has not been garbage collected
+_in_use = 0
+
+
+def _new_figure(figsize, dpi):
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    with _lock:
+        _alive.add(fig)
+    return fig
+
+
+@contextlib.contextmanager
+def figure(figsize, dpi, reuse=False):
+    """
+    A pyplot-free Figure for the duration of the block, cleared on exit.
+    With `reuse`, an idle figure of the same size and dpi is taken from the
+    pool if there is one, and the figure goes back to the pool afterwards.
+    """
+    global _in_use
+    key = (tuple(figsize), dpi)
+    fig = None
+    with _lock:
+        if reuse and _pool.get(key):
+            fig = _pool[key].pop()
+        _in_use += 1
+    try:
+        if fig is None:
+            fig = _new_figure(figsize, dpi)
+        yield fig
+    finally:
+        with _lock:
+            _in_use -= 1
+        if fig is not None:
+            fig.clear()
+            if reuse and FIGURE_POOL_SIZE > 0:
+                # Drawing code may have resized the figure; it must come back as requested
+                fig.set_size_inches(figsize)
+                fig.set_dpi(dpi)
+                with _lock:
+                    idle = _pool.setdefault(key, [])
+                    if len(idle) < FIGURE_POOL_SIZE:
+                        idle.append(fig)
+
+
+@contextlib.contextmanager
+def subplots(figsize, dpi, reuse=False):
+    """`figure` with a single full-size subplot; yields (fig, ax)."""
+    with figure(figsize, dpi, reuse) as fig:
+        yield fig, fig.add_subplot()
+
+
+def clear_pool():
+    with _lock:
+        _pool.clear()
+
+
+# --- Memory reporting ---
+def rss_mb():
+    """Resident memory of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KB on Linux
+
+
+def figure_stats():
+    """Figures in use, pooled and still alive here, figures left in pyplot's registry, and RSS."""
+    with _lock:
+        stats = {"in_use": _in_use, "pooled": sum(len(idle) for idle in _pool.values()), "alive": len(_alive)}
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    stats["pyplot"] = len(pyplot.get_fignums()) if pyplot is not None else 0
+    stats["rss_mb"] = rss_mb()
+    return stats
+
+
+def figure_summary():
+    stats = figure_stats()
+    rss = f" · RSS {stats['rss_mb']:.0f} MB" if stats["rss_mb"] is not None else ""
+    return (f"Figures: {stats['in_use']} rendering · {stats['pooled']} pooled · {stats['alive']} alive"
+            + (f" · {stats['pyplot']} in pyplot" if stats["pyplot"] else "") + rss)
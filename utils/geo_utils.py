@@ -1,7 +1,75 @@
 # utils/geo_utils.py
 
+import contextlib
+import threading
+
 import numpy as np
 from matplotlib.patches import Rectangle as MplRectangle
+from pyproj import Transformer
+
+from utils.metrics import timed
+
+# --- Projection ---
+# A pyproj Transformer must not be used from two threads at once, and
+# Streamlit runs every rerun in a new thread. One transformer per CRS pair is
+# built on first use and shared by the whole process; its lock serialises the
+# (vectorised, short) calls that use it.
+_transformers_lock = threading.Lock()
+_transformers = {}  # (src, dst) -> (lock, transformer)
+
+@contextlib.contextmanager
+def get_transformer(src, dst):
+    """Lon/lat-ordered (always_xy) transformer from CRS `src` to `dst`, held exclusively inside the block."""
+    with _transformers_lock:
+        entry = _transformers.get((src, dst))
+        if entry is None:
+            entry = _transformers[(src, dst)] = (threading.Lock(), Transformer.from_crs(src, dst, always_xy=True))
+    lock, transformer = entry
+    with lock:
+        yield transformer
+
+@timed("geo.project_xy")
+def project_xy(x, y, src="EPSG:4326", dst="EPSG:3857"):
+    """Projects coordinate arrays in one call, without building geometries."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    with get_transformer(src, dst) as transformer:
+        return transformer.transform(x, y)
+
+@timed("geo.project_bounds")
+def project_bounds(bounds, src="EPSG:3857", dst="EPSG:4326"):
+    """(minx, miny, maxx, maxy) `bounds` in `src` reprojected to `dst` bounds."""
+    with get_transformer(src, dst) as transformer:
+        return transformer.transform_bounds(*bounds)
+
+# --- Graticule ---
+@timed("geo.graticule_ticks")
+def graticule_ticks(bounds, crs="EPSG:4326", num_ticks=5, decimals=None):
+    """
+    Evenly spaced lon/lat ticks across (minx, miny, maxx, maxy) `bounds` given
+    in `crs`. Returns (x positions, lons, y positions, lats), positions in
+    `crs` along the bottom and left edges; lon/lat values are rounded to
+    `decimals` places if given.
+    """
+    lon_min, lat_min, lon_max, lat_max = bounds if crs == "EPSG:4326" else project_bounds(bounds, crs, "EPSG:4326")
+    lons = np.linspace(lon_min, lon_max, num_ticks)
+    lats = np.linspace(lat_min, lat_max, num_ticks)
+    if decimals is not None:
+        lons, lats = np.round(lons, decimals), np.round(lats, decimals)
+    if crs == "EPSG:4326":
+        return lons, lons, lats, lats
+    x, _ = project_xy(lons, np.full(num_ticks, lat_min), "EPSG:4326", crs)
+    _, y = project_xy(np.full(num_ticks, lon_min), lats, "EPSG:4326", crs)
+    return x, lons, y, lats
+
+def lon_labels(lons, decimals=2, hemisphere=True):
+    if not hemisphere:
+        return [f"{lon:.{decimals}f}°" for lon in lons]
+    return [f"{abs(lon):.{decimals}f}°{'W' if lon < 0 else 'E'}" for lon in lons]
+
+def lat_labels(lats, decimals=2, hemisphere=True):
+    if not hemisphere:
+        return [f"{lat:.{decimals}f}°" for lat in lats]
+    return [f"{abs(lat):.{decimals}f}°{'S' if lat < 0 else 'N'}" for lat in lats]
 
 def add_map_border(ax, linewidth=1.5, color='black'):
     rect = MplRectangle((0, 0), 1, 1, transform=ax.transAxes, linewidth=linewidth,
@@ -9,12 +77,12 @@ def add_map_border(ax, linewidth=1.5, color='black'):
     ax.add_patch(rect)
 
 def add_latlon_ticks(ax, bounds, fontsize=15):
-    xticks = np.round(np.linspace(bounds[0], bounds[1], 5), 1)
-    yticks = np.round(np.linspace(bounds[2], bounds[3], 5), 1)
+    # `bounds` is [minx, maxx, miny, maxy] in degrees, as from square_bounds_with_buffer
+    xticks, lons, yticks, lats = graticule_ticks((bounds[0], bounds[2], bounds[1], bounds[3]), decimals=1)
     ax.set_xticks(xticks)
     ax.set_yticks(yticks)
-    ax.set_xticklabels([f"{x:.1f}°" for x in xticks], fontsize=fontsize)
-    ax.set_yticklabels([f"{y:.1f}°" for y in yticks], fontsize=fontsize)
+    ax.set_xticklabels(lon_labels(lons, 1, hemisphere=False), fontsize=fontsize)
+    ax.set_yticklabels(lat_labels(lats, 1, hemisphere=False), fontsize=fontsize)
     ax.tick_params(axis='x', which='both', top=True, bottom=True, labeltop=True, labelbottom=True,
                    length=8, width=1.5, direction='out', pad=10)
     ax.tick_params(axis='y', which='both', left=True, right=True, labelleft=True, labelright=True,
@@ -0,0 +1,183 @@
+# utils/ingest.py
+#
+# Chunked ingestion of uploaded site tables. The header is read on its own
+# for column detection; afterwards only the site, latitude and longitude
+# columns are read, a chunk at a time, and each chunk's coordinates are
+# parsed before the next is read, so the raw table is never held in memory
+# as a whole.
+
+import numpy as np
+import pandas as pd
+
+from utils.coords import parse_latlon_series
+from utils.metrics import timed
+
+INGEST_CHUNK_ROWS = 100_000
+MAX_BAD_ROWS = 100
+
+LAT_KEYS = ['lat', 'latitude', 'y']
+LON_KEYS = ['lon', 'lng', 'long', 'longitude', 'x']
+SITE_KEYS = ['site', 'sitename', 'station', 'location', 'place', 'sampleid', 'name', 'point']
+
+
+# --- Header ---
+def _raw_header(uploaded_file, file_type):
+    uploaded_file.seek(0)
+    if file_type == 'csv':
+        return pd.read_csv(uploaded_file, nrows=0).columns.tolist()
+    if file_type == 'xlsx':
+        import openpyxl
+
+        wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            first = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+        return [f"Unnamed: {i}" if value is None else str(value) for i, value in enumerate(first)]
+    if file_type == 'xls':
+        return pd.read_excel(uploaded_file, nrows=0).columns.tolist()
+    raise ValueError(f"Unsupported file type: {file_type}")
+
+
+@timed("ingest.read_header")
+def read_header(uploaded_file, file_type):
+    """Column names of the upload, stripped of surrounding whitespace."""
+    return [str(col).strip() for col in _raw_header(uploaded_file, file_type)]
+
+
+# --- Column auto-detection ---
+def auto_detect_column(cols, keywords):
+    for key in keywords:
+        for col in cols:
+            norm_col = col.strip().lower().replace(" ", "").replace("_", "")
+            if key == norm_col:
+                return col
+    return None
+
+
+def auto_detect_site_column(columns, lat_col, lon_col, site_keys):
+    # 1. Try keyword-based match
+    for key in site_keys:
+        for col in columns:
+            norm_col = col.strip().lower().replace(" ", "").replace("_", "")
+            if key == norm_col:
+                return col
+    # 2. Fallback: left of lat/lon
+    try:
+        lat_idx = columns.index(lat_col)
+        if lat_idx > 0:
+            return columns[lat_idx - 1]
+    except ValueError:
+        pass
+    try:
+        lon_idx = columns.index(lon_col)
+        if lon_idx > 0:
+            return columns[lon_idx - 1]
+    except ValueError:
+        pass
+    # 3. Fallback: right of lat/lon
+    try:
+        lat_idx = columns.index(lat_col)
+        if lat_idx < len(columns) - 1:
+            return columns[lat_idx + 1]
+    except ValueError:
+        pass
+    try:
+        lon_idx = columns.index(lon_col)
+        if lon_idx < len(columns) - 1:
+            return columns[lon_idx + 1]
+    except ValueError:
+        pass
+    return None
+
+
+def detect_columns(columns):
+    """Best-guess (site, lat, lon) column names; any may be None."""
+    auto_lat = auto_detect_column(columns, LAT_KEYS)
+    auto_lon = auto_detect_column(columns, LON_KEYS)
+    # Only try to auto-detect site_col once lat/lon found
+    if auto_lat or auto_lon:
+        auto_site = auto_detect_site_column(columns, auto_lat or "", auto_lon or "", SITE_KEYS)
+    else:
+        auto_site = auto_detect_column(columns, SITE_KEYS)
+    return auto_site, auto_lat, auto_lon
+
+
+# --- Chunks ---
+def iter_columns(uploaded_file, file_type, columns, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    Yields DataFrames holding only `columns` (stripped names, as returned by
+    `read_header`), at most `chunk_rows` rows each, indexed by data row.
+    """
+    raw = _raw_header(uploaded_file, file_type)
+    stripped = [str(col).strip() for col in raw]
+    positions = [stripped.index(col) for col in dict.fromkeys(columns)]
+    names = [stripped[i] for i in positions]
+    uploaded_file.seek(0)
+
+    if file_type == 'csv':
+        reader = pd.read_csv(uploaded_file, usecols=positions, chunksize=chunk_rows)
+        for chunk in reader:
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk[names]
+    elif file_type == 'xlsx':
+        import openpyxl
+
+        wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(min_row=2, values_only=True)
+            start = 0
+            buffer = []
+            for row in rows:
+                if not any(value is not None for value in row):
+                    continue  # blank rows (read_only sheets often report trailing ones)
+                buffer.append([row[i] if i < len(row) else None for i in positions])
+                if len(buffer) == chunk_rows:
+                    yield pd.DataFrame(buffer, columns=names, index=pd.RangeIndex(start, start + len(buffer)))
+                    start += len(buffer)
+                    buffer = []
+            if buffer or start == 0:
+                yield pd.DataFrame(buffer, columns=names, index=pd.RangeIndex(start, start + len(buffer)))
+        finally:
+            wb.close()
+    elif file_type == 'xls':
+        # xlrd has no streaming reader; this still only keeps the chosen columns
+        df = pd.read_excel(uploaded_file, usecols=positions)
+        df.columns = [str(col).strip() for col in df.columns]
+        yield df[names]
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+
+# --- Sites ---
+@timed("ingest.ingest_sites")
+def ingest_sites(uploaded_file, file_type, site_col, lat_col, lon_col, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    Reads and parses the site table chunk by chunk. Returns `(sites, failed,
+    bad_rows)`: a compact site/lat/lon frame (string sites, float64
+    coordinates, NaN where parsing failed), the mask of unparseable rows, and
+    the first `MAX_BAD_ROWS` of those rows as they appear in the upload.
+    """
+    site_parts, lat_parts, lon_parts, failed_parts, bad_parts = [], [], [], [], []
+    n_bad = 0
+    for chunk in iter_columns(uploaded_file, file_type, [site_col, lat_col, lon_col], chunk_rows):
+        lat, lat_failed = parse_latlon_series(chunk[lat_col])
+        lon, lon_failed = parse_latlon_series(chunk[lon_col])
+        failed = (lat_failed | lon_failed).to_numpy()
+        site_parts.append(chunk[site_col].astype(str).astype("string[pyarrow]"))
+        lat_parts.append(lat.to_numpy(dtype=float))
+        lon_parts.append(lon.to_numpy(dtype=float))
+        failed_parts.append(failed)
+        if n_bad < MAX_BAD_ROWS and failed.any():
+            bad = chunk.loc[failed, [site_col, lat_col, lon_col]].head(MAX_BAD_ROWS - n_bad)
+            bad_parts.append(bad)
+            n_bad += len(bad)
+
+    sites = pd.DataFrame({
+        "site": pd.concat(site_parts, ignore_index=True),
+        "lat": np.concatenate(lat_parts),
+        "lon": np.concatenate(lon_parts),
+    })
+    failed = pd.Series(np.concatenate(failed_parts), index=sites.index)
+    bad_rows = pd.concat(bad_parts) if bad_parts else pd.DataFrame(columns=[site_col, lat_col, lon_col])
+    return sites, failed, bad_rows
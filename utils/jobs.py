@@ -0,0 +1,316 @@
+# utils/jobs.py
+#
+# Server-wide render job queue behind the Batch Jobs page. Jobs from every
+# session share one bounded pool of low-priority worker processes; each
+# session may only have a few jobs in flight and free slots go round-robin
+# across sessions, so one large upload cannot starve other users. Workers
+# report each pipeline stage back over a queue, so pages can poll progress
+# without blocking on renders. A job's uploaded table is deleted as soon as
+# it finishes; its composites are kept until the session clears them or
+# ends (see utils/sessions.py), or for at most the TTL.
+#
+#   PAPERMAP_JOB_WORKERS        worker processes (default: CPUs - 1)
+#   PAPERMAP_JOBS_PER_SESSION   jobs one session may have running at once
+
+import concurrent.futures
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict, deque
+
+from utils.pipeline import FILE_TYPES, project_stages
+from utils.sessions import ended_sessions
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("PAPERMAP_JOB_WORKERS", max(1, (os.cpu_count() or 1) - 1)))
+JOBS_PER_SESSION = int(os.environ.get("PAPERMAP_JOBS_PER_SESSION", 2))
+JOB_NICENESS = 10
+JOB_TTL_SECONDS = 2 * 3600  # finished jobs (and their files) are dropped after this
+MAX_UPLOAD_FILES = 200
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024  # uncompressed, across all files of one upload
+
+
+# --- Uploads ---
+def expand_uploads(files):
+    """(name, bytes) for each site table in `files`, unpacking ZIP archives."""
+    tables = []
+    total = 0
+
+    def check(n_files, n_bytes):
+        if n_files > MAX_UPLOAD_FILES:
+            raise ValueError(f"At most {MAX_UPLOAD_FILES} files can be queued at once")
+        if n_bytes > MAX_UPLOAD_BYTES:
+            raise ValueError(f"Uploads may hold at most {MAX_UPLOAD_BYTES / 2**20:.0f} MB of tables (uncompressed)")
+
+    for f in files:
+        ext = os.path.splitext(f.name)[1].lstrip(".").lower()
+        if ext == "zip":
+            with zipfile.ZipFile(io.BytesIO(f.getvalue())) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not (info.is_dir() or info.filename.startswith("__MACOSX/")
+                            or os.path.basename(info.filename).startswith(("~$", "."))
+                            or os.path.splitext(info.filename)[1].lstrip(".").lower() not in FILE_TYPES)
+                ]
+                # Checked against the sizes in the archive's directory before
+                # anything is decompressed; zipfile never reads past them
+                total += sum(info.file_size for info in members)
+                check(len(tables) + len(members), total)
+                tables.extend((os.path.basename(info.filename), archive.read(info)) for info in members)
+        elif ext in FILE_TYPES:
+            total += len(f.getvalue())
+            check(len(tables) + 1, total)
+            tables.append((f.name, f.getvalue()))
+    return tables
+
+
+# --- Worker side ---
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    import matplotlib
+
+    matplotlib.use("Agg")
+    _progress_queue = progress_queue
+    try:
+        os.nice(JOB_NICENESS)  # interactive renders in the server process come first
+    except (AttributeError, OSError):
+        pass
+
+
+def _run_job(job_id, path, out_dir, options):
+    from utils.batch import run_one
+
+    def progress(stage):
+        _progress_queue.put((job_id, stage))
+
+    return run_one(path, out_dir, dict(options, progress=progress))
+
+
+# --- Queue ---
+class Job:
+    def __init__(self, session_id, name, path, out_dir, options):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.name = name
+        self.path = path
+        self.out_dir = out_dir
+        self.options = options
+        self.status = "queued"  # -> running -> done | failed
+        self.stage = None
+        self.stages_started = 0
+        self.n_stages = len(project_stages(options.get("formats", ("png",))))
+        self.entry = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+
+    def progress(self):
+        if self.status in ("done", "failed"):
+            return 1.0
+        return min(max(self.stages_started - 1, 0) / self.n_stages, 0.99)
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress(),
+            "seconds": round((self.finished or time.time()) - self.started, 1) if self.started else None,
+            "error": (self.entry or {}).get("error"),
+            "outputs": (self.entry or {}).get("outputs", []),
+        }
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, per_session=JOBS_PER_SESSION):
+        self.workers = workers
+        self.per_session = per_session
+        self.root = tempfile.mkdtemp(prefix="papermap-jobs-")
+        self._lock = threading.RLock()  # done callbacks may run inside _dispatch
+        self._jobs = {}  # id -> Job
+        self._pending = OrderedDict()  # session -> deque of queued jobs, in round-robin order
+        self._running = {}  # session -> jobs in flight
+        self._pool = None
+        self._progress = None
+        self._ended = ended_sessions()
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._progress = ctx.Queue()
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=ctx, initializer=_init_worker, initargs=(self._progress,),
+            )
+            threading.Thread(target=self._listen, args=(self._progress,), name="papermap-job-progress",
+                             daemon=True).start()
+
+    def _reset_pool(self, pool):
+        # Several failed futures report the same broken pool, possibly after a
+        # new one has been started: only the pool that broke is dropped
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self._progress.put(None)  # stops that pool's listener
+            self._progress = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _listen(self, progress):
+        while True:
+            message = progress.get()
+            if message is None:
+                progress.close()
+                return
+            job_id, stage = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "running":
+                    job.stage = stage
+                    job.stages_started += 1
+
+    def submit(self, session_id, name, data, options):
+        """Queues one site table; returns the job id."""
+        self._expire()
+        job_dir = tempfile.mkdtemp(dir=self.root)
+        path = os.path.join(job_dir, os.path.basename(name))
+        with open(path, "wb") as f:
+            f.write(data)
+        job = Job(session_id, name, path, os.path.join(job_dir, "out"), options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.setdefault(session_id, deque()).append(job)
+        self._dispatch()
+        return job.id
+
+    def _dispatch(self):
+        with self._lock:
+            self._ensure_pool()
+            while sum(self._running.values()) < self.workers:
+                session_id = next((s for s, queued in self._pending.items()
+                                   if queued and self._running.get(s, 0) < self.per_session), None)
+                if session_id is None:
+                    break
+                job = self._pending[session_id].popleft()
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+                else:
+                    self._pending.move_to_end(session_id)  # next free slot goes to another session
+                self._running[session_id] = self._running.get(session_id, 0) + 1
+                job.status = "running"
+                job.started = time.time()
+                try:
+                    future = self._pool.submit(_run_job, job.id, job.path, job.out_dir, job.options)
+                except concurrent.futures.process.BrokenProcessPool as e:
+                    future = concurrent.futures.Future()
+                    future.set_exception(e)
+                future.add_done_callback(lambda f, job=job, pool=self._pool: self._finish(job, f, pool))
+
+    def _finish(self, job, future, pool):
+        try:
+            entry = future.result()
+        except Exception as e:  # worker died
+            logger.warning("Render job %s failed in the pool: %s", job.name, e)
+            entry = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                self._reset_pool(pool)
+        _remove(job.path)  # the uploaded table is not needed any more
+        with self._lock:
+            job.entry = entry
+            job.status = "done" if entry.get("status") == "ok" else "failed"
+            job.finished = time.time()
+            self._running[job.session_id] -= 1
+            orphaned = job.id not in self._jobs  # its session ended while it ran
+        if orphaned:
+            shutil.rmtree(os.path.dirname(job.path), ignore_errors=True)
+        self._dispatch()
+
+    # --- Session views ---
+    def jobs(self, session_id):
+        self._expire()
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values() if job.session_id == session_id]
+
+    def active(self, session_id):
+        with self._lock:
+            return any(job.session_id == session_id and job.status in ("queued", "running")
+                       for job in self._jobs.values())
+
+    def zip_outputs(self, session_id):
+        """ZIP of every finished composite of the session, plus a JSON report of all its jobs."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.session_id == session_id]
+        buf = io.BytesIO()
+        used = set()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+            for job in jobs:
+                for path in (job.entry or {}).get("outputs", []):
+                    name = os.path.basename(path)
+                    stem, ext = os.path.splitext(name)
+                    n = 1
+                    while name in used:
+                        n += 1
+                        name = f"{stem}_{n}{ext}"
+                    used.add(name)
+                    archive.write(path, name)
+            report = [dict(job.snapshot(), timings=(job.entry or {}).get("timings")) for job in jobs]
+            archive.writestr("report.json", json.dumps(report, indent=1))
+        return buf.getvalue()
+
+    def clear(self, session_id):
+        """Drops the session's finished jobs and their files."""
+        with self._lock:
+            done = [job for job in self._jobs.values()
+                    if job.session_id == session_id and job.status in ("done", "failed")]
+            for job in done:
+                del self._jobs[job.id]
+        for job in done:
+            shutil.rmtree(os.path.dirname(job.path), ignore_errors=True)
+
+    def _expire(self):
+        ended = set()
+        while self._ended:
+            ended.add(self._ended.popleft())
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            # Queued jobs of ended sessions are cancelled; running ones are
+            # forgotten here and their files removed when they finish
+            for session_id in ended:
+                self._pending.pop(session_id, None)
+            old = [job for job in self._jobs.values()
+                   if (job.finished and job.finished < cutoff) or job.session_id in ended]
+            for job in old:
+                del self._jobs[job.id]
+            old = [job for job in old if job.status != "running"]
+        for job in old:
+            shutil.rmtree(os.path.dirname(job.path), ignore_errors=True)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,138 @@
+# utils/labels.py
+#
+# Batched site labels. Instead of one Text artist per site, every label is
+# assembled from cached glyph outlines into a single PathCollection, after
+# thinning out labels that would collide with one already placed.
+
+import functools
+
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import Affine2D
+
+from utils.metrics import timed
+
+MAX_LABELS = 1000
+BG_PAD = 0.2  # background padding, in font sizes (as boxstyle 'round,pad=0.2')
+
+
+# --- Glyph atlas ---
+@functools.lru_cache(maxsize=4096)
+def _glyph(ch, weight):
+    """Outline of `ch` at a 1 pt font size, and its advance width in points."""
+    prop = FontProperties(weight=weight, size=1)
+    advance = text_to_path.get_text_width_height_descent(ch, prop, ismath=False)[0]
+    if ch.isspace():
+        return np.empty((0, 2)), np.empty(0, dtype=Path.code_type), advance
+    path = TextPath((0, 0), ch, size=1, prop=prop)
+    return path.vertices, path.codes, advance
+
+
+@functools.lru_cache(maxsize=8)
+def _line_metrics(weight):
+    """(height, descent) of a label line at a 1 pt font size, as matplotlib lays out text."""
+    _, height, descent = text_to_path.get_text_width_height_descent("lp", FontProperties(weight=weight, size=1), ismath=False)
+    return height, descent
+
+
+def label_widths(labels, weight="normal"):
+    """Advance width of each label at a 1 pt font size (kerning ignored)."""
+    return np.array([sum(_glyph(ch, weight)[2] for ch in label) for label in labels])
+
+
+def label_path(label, weight="normal"):
+    """One compound path for `label` at 1 pt, bottom-left at the origin."""
+    _, descent = _line_metrics(weight)
+    verts, codes, x = [], [], 0.0
+    for ch in label:
+        v, c, advance = _glyph(ch, weight)
+        verts.append(v + (x, descent))
+        codes.append(c)
+        x += advance
+    if not verts:
+        return Path(np.empty((0, 2)))
+    return Path(np.concatenate(verts), np.concatenate(codes))
+
+
+# --- Thinning ---
+def thin_labels(ax, x, y, widths, height, max_labels=MAX_LABELS):
+    """
+    Mask of the labels to draw, in input order: a label is dropped when its
+    box (in points, bottom-left at its anchor) overlaps a cell of the grid
+    already taken by an earlier label, or lies outside the axes. At most
+    `max_labels` are kept.
+    """
+    ax.apply_aspect()
+    fig = ax.get_figure()
+    pts = ax.transData.transform(np.column_stack([x, y])) * (72 / fig.dpi)
+    bbox = ax.bbox.transformed(Affine2D().scale(72 / fig.dpi))
+
+    cell = height  # one line of text per grid row
+    inside = ((pts[:, 0] >= bbox.x0) & (pts[:, 0] <= bbox.x1) &
+              (pts[:, 1] >= bbox.y0) & (pts[:, 1] <= bbox.y1))
+    col0 = np.floor(pts[:, 0] / cell).astype(np.int64)
+    col1 = np.floor((pts[:, 0] + widths) / cell).astype(np.int64)
+    row0 = np.floor(pts[:, 1] / cell).astype(np.int64)
+    row1 = np.floor((pts[:, 1] + height) / cell).astype(np.int64)
+
+    keep = np.zeros(len(pts), dtype=bool)
+    taken = set()
+    kept = 0
+    for i in np.flatnonzero(inside):
+        cells = [(c, r) for c in range(col0[i], col1[i] + 1) for r in range(row0[i], row1[i] + 1)]
+        if any(c in taken for c in cells):
+            continue
+        taken.update(cells)
+        keep[i] = True
+        kept += 1
+        if kept >= max_labels:
+            break
+    return keep
+
+
+# --- Drawing ---
+@timed("labels.draw")
+def draw_labels(ax, x, y, labels, fontsize=9, color="black", weight="normal", bg_color=None,
+                thin=False, max_labels=MAX_LABELS, zorder=3):
+    """
+    Draws `labels` with their bottom-left corner at the data coordinates
+    `x`, `y` as one PathCollection (plus one for backgrounds). With `thin`,
+    overlapping labels and those beyond `max_labels` are left out; otherwise
+    every label is drawn. Returns the number of labels left out.
+    """
+    labels = [str(label) for label in labels]
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    widths = label_widths(labels, weight) * fontsize
+    height = _line_metrics(weight)[0] * fontsize
+    if thin:
+        idx = np.flatnonzero(thin_labels(ax, x, y, widths, height, max_labels))
+    else:
+        idx = np.arange(len(labels))
+    hidden = len(labels) - len(idx)
+    if len(idx) == 0:
+        return hidden
+
+    fig = ax.get_figure()
+    offsets = np.column_stack([x[idx], y[idx]])
+    # Paths are in points (scaled by the font size), so labels keep their size at any savefig dpi
+    scale = Affine2D().scale(fontsize / 72) + fig.dpi_scale_trans
+
+    if bg_color is not None:
+        pad = BG_PAD
+        boxes = [Path.unit_rectangle().transformed(
+                     Affine2D().scale(widths[i] / fontsize + 2 * pad, height / fontsize + 2 * pad).translate(-pad, -pad))
+                 for i in idx]
+        ax.add_collection(PathCollection(
+            boxes, offsets=offsets, offset_transform=ax.transData, transform=scale,
+            facecolors=bg_color, edgecolors="none", zorder=zorder - 0.01,
+        ), autolim=False)
+
+    ax.add_collection(PathCollection(
+        [label_path(labels[i], weight) for i in idx], offsets=offsets, offset_transform=ax.transData,
+        transform=scale, facecolors=color, edgecolors="none", zorder=zorder,
+    ), autolim=False)
+    return hidden
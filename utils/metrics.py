@@ -0,0 +1,149 @@
+# utils/metrics.py
+#
+# Process-wide timings and counters for the hot paths: file reading and
+# coordinate parsing, the admin lookup, basemap tiles, drawing, savefig,
+# compositing and projection. Wrap a block in `with timed("stage"):` or
+# decorate a function with `@timed("stage")`, and call `count("event")` for
+# events. Each stage keeps its most recent durations, so `stage_stats`
+# reports recent latency percentiles. Worker processes (overview maps, batch
+# jobs) keep their own numbers.
+#
+#   PAPERMAP_PERF_LOG      "stderr" or a file path: one JSON line per timing (default: off)
+#   PAPERMAP_ADMIN_TOKEN   shows the performance panel to sessions that opened a page with ?admin=<token>
+
+import functools
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+METRICS_SAMPLES = 1000  # most recent durations kept per stage
+PERF_LOG = os.environ.get("PAPERMAP_PERF_LOG", "")
+ADMIN_TOKEN = os.environ.get("PAPERMAP_ADMIN_TOKEN", "")
+
+_lock = threading.Lock()
+_stages = {}  # name -> [calls, total seconds, recent durations]
+_counters = {}
+
+perf_log = logging.getLogger("papermap.perf")
+if PERF_LOG:
+    _handler = logging.StreamHandler(sys.stderr) if PERF_LOG == "stderr" else logging.FileHandler(PERF_LOG)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    perf_log.addHandler(_handler)
+    perf_log.setLevel(logging.INFO)
+    perf_log.propagate = False
+
+
+# --- Recording ---
+def record(name, seconds):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = [0, 0.0, deque(maxlen=METRICS_SAMPLES)]
+        stage[0] += 1
+        stage[1] += seconds
+        stage[2].append(seconds)
+    if PERF_LOG:
+        perf_log.info(json.dumps({
+            "ts": round(time.time(), 3), "pid": os.getpid(), "thread": threading.current_thread().name,
+            "stage": name, "ms": round(seconds * 1000, 3),
+        }))
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class timed:
+    """Times a `with` block, or every call of a decorated function, as stage `name`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        record(self.name, self.seconds)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+# --- Reporting ---
+def stage_stats():
+    """Per stage: calls, total seconds, and mean/p50/p90/p99/max milliseconds over the recent samples."""
+    with _lock:
+        snapshot = {name: (calls, total, np.array(samples)) for name, (calls, total, samples) in _stages.items()}
+    stats = {}
+    for name, (calls, total, samples) in sorted(snapshot.items()):
+        p50, p90, p99 = (np.percentile(samples, [50, 90, 99]) * 1000).tolist()
+        stats[name] = {
+            "calls": calls, "total_s": round(total, 3), "mean_ms": round(float(samples.mean()) * 1000, 2),
+            "p50_ms": round(p50, 2), "p90_ms": round(p90, 2), "p99_ms": round(p99, 2),
+            "max_ms": round(float(samples.max()) * 1000, 2),
+        }
+    return stats
+
+
+def counters():
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+# --- Admin panel ---
+def perf_panel():
+    """
+    Sidebar expander with this process's stage latencies and counters, for
+    sessions that have opened any page with ?admin=<PAPERMAP_ADMIN_TOKEN>.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    if not ADMIN_TOKEN:
+        return
+    token = st.query_params.get("admin")
+    if token is not None and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        st.session_state['perf_admin'] = True
+    if not st.session_state.get('perf_admin'):
+        return
+    from utils.figures import figure_summary
+
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        stats = stage_stats()
+        if stats:
+            st.dataframe(
+                pd.DataFrame([{"Stage": name, "Calls": s["calls"], "p50 ms": s["p50_ms"], "p90 ms": s["p90_ms"],
+                               "p99 ms": s["p99_ms"], "Max ms": s["max_ms"], "Total s": s["total_s"]}
+                              for name, s in stats.items()]),
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.caption("No timings recorded yet.")
+        if counters():
+            st.dataframe(pd.DataFrame(list(counters().items()), columns=["Counter", "Count"]),
+                         hide_index=True, use_container_width=True)
+        st.caption(f"Process {os.getpid()} · last {METRICS_SAMPLES} calls per stage · {figure_summary()}")
+        if st.button("Reset timings", key="perf_reset"):
+            reset()
+            st.rerun()
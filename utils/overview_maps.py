@@ -0,0 +1,330 @@
+# utils/overview_maps.py
+#
+# Overview maps for page 02. The India map is the same for every session
+# apart from the highlighted state, so it can be served from a prebuilt
+# raster: a base image (grey states, borders, ticks, frame) and one cropped
+# RGBA highlight per state, alpha-composited on request. Build them with
+#
+#   python -m utils.build_data india-overview
+#
+# The three maps are independent, so `render_overviews` renders them in a
+# small process pool (Agg backend) and the page waits for the slowest one.
+# Each worker has its own boundary cache. The maps draw simplified levels and
+# state partitions, so a worker only loads a full layer (memory-mapped when
+# converted) if those have not been built.
+# The India map depends only on the detected state, so finished ones are
+# also kept in a process-wide cache shared by every session.
+
+import concurrent.futures
+import functools
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+
+import matplotlib
+from matplotlib.patches import Rectangle
+from PIL import Image
+
+from utils.boundary_store import (
+    DISTRICT_SHAPEFILE_PATH, STATE_SHAPEFILE_PATH, data_version, district_bounds, get_state_districts, get_states,
+    layer_bounds,
+)
+from utils.figures import subplots
+from utils.geo_utils import add_latlon_ticks, add_map_border, project_bounds, square_bounds_with_buffer
+from utils.metrics import timed
+from utils.render_cache import RenderCache, make_key
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_SIZE_IN = 6
+OVERVIEW_DPI = 100
+OVERVIEW_PAD_IN = 0.06
+
+OVERVIEW_DIR = "data/overview"
+INDIA_MANIFEST_PATH = os.path.join(OVERVIEW_DIR, "india_manifest.json")
+INDIA_LAYERS_VERSION = 1  # bump when the India map styling changes
+
+HIGHLIGHT_STYLE = dict(color="#ff6666", edgecolor="black", linewidth=2.5, zorder=2)
+
+
+def _cpu_count():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# One process per map, capped by the CPUs available; 0 or 1 renders the maps
+# one after another in the calling process
+OVERVIEW_WORKERS = int(os.environ.get("PAPERMAP_OVERVIEW_WORKERS", min(3, _cpu_count())))
+
+INDIA_MAP_CACHE_MB = float(os.environ.get("PAPERMAP_INDIA_MAP_CACHE_MB", 8))
+india_map_cache = RenderCache(INDIA_MAP_CACHE_MB * 1e6, name="India overview")
+
+
+def overview_pixel_size(bounds):
+    """Degrees per output pixel for a square overview map spanning `bounds`."""
+    return (bounds[1] - bounds[0]) / (OVERVIEW_SIZE_IN * OVERVIEW_DPI)
+
+
+def _render_png(draw, *args):
+    with subplots((OVERVIEW_SIZE_IN, OVERVIEW_SIZE_IN), OVERVIEW_DPI, reuse=True) as (fig, ax):
+        with timed("overview.draw"):
+            draw(ax, *args)
+        buf = io.BytesIO()
+        with timed("overview.savefig"):
+            fig.savefig(buf, format="png", dpi=OVERVIEW_DPI, bbox_inches='tight', pad_inches=OVERVIEW_PAD_IN)
+    return buf.getvalue()
+
+
+# --- India map ---
+def india_bounds():
+    return square_bounds_with_buffer(layer_bounds(STATE_SHAPEFILE_PATH), 0.05)
+
+
+def draw_india_base(ax, states, bounds):
+    states.plot(ax=ax, color="#e5e5e5", edgecolor="black", linewidth=0.5, zorder=1)
+    ax.set_xlim(bounds[0], bounds[1])
+    ax.set_ylim(bounds[2], bounds[3])
+    add_latlon_ticks(ax, bounds)
+    add_map_border(ax)
+
+
+def draw_state_highlight(ax, states, state_name):
+    aspect = ax.get_aspect()
+    states[states['State_Name'] == state_name].plot(ax=ax, **HIGHLIGHT_STYLE)
+    ax.set_aspect(aspect)  # GeoDataFrame.plot resets it from the highlighted state's latitude
+
+
+def draw_india_map(ax, detected_state):
+    bounds = india_bounds()
+    states_lod = get_states(pixel_size=overview_pixel_size(bounds))
+    draw_india_base(ax, states_lod, bounds)
+    draw_state_highlight(ax, states_lod, detected_state)
+
+
+def render_india_map(detected_state):
+    """Vector render of the India map with `detected_state` highlighted, as PNG bytes."""
+    return _render_png(draw_india_map, detected_state)
+
+
+# --- Prebuilt India layers ---
+def _state_filename(state_name):
+    return "india_" + re.sub(r"[^A-Za-z0-9]+", "_", state_name).strip("_") + ".png"
+
+
+def _source_token():
+    # The India map draws the state layer's simplified levels only
+    return [INDIA_LAYERS_VERSION, data_version(STATE_SHAPEFILE_PATH)]
+
+
+def build_india_layers(out_dir=OVERVIEW_DIR):
+    """
+    Renders the India base once and every state's highlight on a transparent
+    copy of the same axes, both cropped to the base's tight bounding box so
+    they line up pixel for pixel. Writes the PNGs and a manifest to `out_dir`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    bounds = india_bounds()
+    states_lod = get_states(pixel_size=overview_pixel_size(bounds))
+    figsize = (OVERVIEW_SIZE_IN, OVERVIEW_SIZE_IN)
+
+    with subplots(figsize, OVERVIEW_DPI) as (base_fig, base_ax), \
+            subplots(figsize, OVERVIEW_DPI) as (mask_fig, mask_ax):
+        draw_india_base(base_ax, states_lod, bounds)
+        base_fig.canvas.draw()
+        crop = base_fig.get_tightbbox(base_fig.canvas.get_renderer()).padded(OVERVIEW_PAD_IN)
+        base_fig.savefig(os.path.join(out_dir, "india_base.png"), dpi=OVERVIEW_DPI, bbox_inches=crop)
+
+        mask_ax.set_xlim(bounds[0], bounds[1])
+        mask_ax.set_ylim(bounds[2], bounds[3])
+        mask_ax.set_aspect(base_ax.get_aspect())
+        mask_ax.set_axis_off()
+        manifest = {"source": _source_token(), "base": "india_base.png", "states": {}}
+        for state_name in sorted(states_lod['State_Name'].dropna().unique()):
+            for artist in list(mask_ax.collections):
+                artist.remove()
+            draw_state_highlight(mask_ax, states_lod, state_name)
+            buf = io.BytesIO()
+            mask_fig.savefig(buf, format="png", dpi=OVERVIEW_DPI, bbox_inches=crop, transparent=True)
+            mask = Image.open(buf).convert("RGBA")
+            box = mask.getchannel("A").getbbox()
+            if box is None:
+                continue
+            filename = _state_filename(state_name)
+            mask.crop(box).save(os.path.join(out_dir, filename), optimize=True)
+            manifest["states"][state_name] = {"file": filename, "offset": list(box[:2])}
+
+    with open(os.path.join(out_dir, "india_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+@functools.lru_cache(maxsize=4)
+def _india_layers(manifest_path, mtime_ns):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    root = os.path.dirname(manifest_path)
+    base = Image.open(os.path.join(root, manifest["base"])).convert("RGBA")
+    base.load()
+    return manifest, base, root
+
+
+@functools.lru_cache(maxsize=64)
+def _highlight(path, manifest_mtime_ns):
+    image = Image.open(path).convert("RGBA")
+    image.load()
+    return image
+
+
+@timed("overview.india_blend")
+def composite_india_map(detected_state, manifest_path=INDIA_MANIFEST_PATH):
+    """
+    India map PNG bytes blended from the prebuilt layers, or None when they
+    are missing, stale, or have no highlight for `detected_state`.
+    """
+    try:
+        mtime_ns = os.stat(manifest_path).st_mtime_ns
+        manifest, base, root = _india_layers(manifest_path, mtime_ns)
+    except (OSError, ValueError, KeyError):
+        return None
+    entry = manifest["states"].get(detected_state)
+    if manifest["source"] != _source_token() or entry is None:
+        return None
+    image = base.copy()
+    image.alpha_composite(_highlight(os.path.join(root, entry["file"]), mtime_ns), dest=tuple(entry["offset"]))
+    buf = io.BytesIO()
+    image.save(buf, format="png")
+    return buf.getvalue()
+
+
+def india_map_png(detected_state):
+    png = composite_india_map(detected_state)
+    return png if png is not None else render_india_map(detected_state)
+
+
+# --- State map ---
+def draw_state_map(ax, detected_state, covered_districts):
+    state_bounds = district_bounds(detected_state)
+    pixel_size = None
+    if state_bounds is not None:
+        bounds = square_bounds_with_buffer(state_bounds, 0.05)
+        pixel_size = overview_pixel_size(bounds)
+    states_lod = get_states(pixel_size=pixel_size)
+    state_districts = get_state_districts(detected_state, pixel_size=pixel_size)
+    state_districts.plot(ax=ax, color="#e5e5e5", edgecolor="black", linewidth=0.7, zorder=1)
+    state_districts[state_districts['District'].isin(covered_districts)].plot(ax=ax, color="#ff6666", edgecolor="black", linewidth=2.0, zorder=2)
+    states_lod[states_lod['State_Name'] == detected_state].boundary.plot(ax=ax, color="black", linewidth=2, zorder=3)
+    if state_bounds is not None:
+        ax.set_xlim(bounds[0], bounds[1])
+        ax.set_ylim(bounds[2], bounds[3])
+        add_latlon_ticks(ax, bounds)
+        add_map_border(ax)
+
+
+def render_state_map(detected_state, covered_districts):
+    return _render_png(draw_state_map, detected_state, covered_districts)
+
+
+# --- District map ---
+def draw_district_map(ax, detected_state, covered_districts, study_area_extent=None):
+    covered_bounds = district_bounds(detected_state, covered_districts)
+    if covered_bounds is None:
+        return
+    bounds = square_bounds_with_buffer(covered_bounds, 0.05)
+    districts_lod = get_state_districts(detected_state, pixel_size=overview_pixel_size(bounds))
+    districts_lod[districts_lod['District'].isin(covered_districts)].plot(
+        ax=ax, color="none", edgecolor="black", linewidth=2.5, zorder=2)
+    ax.set_xlim(bounds[0], bounds[1])
+    ax.set_ylim(bounds[2], bounds[3])
+    add_latlon_ticks(ax, bounds)
+    add_map_border(ax)
+    # Study area rectangle, reprojected from the study area map's EPSG:3857 extent
+    if study_area_extent is not None:
+        minx, miny, maxx, maxy = project_bounds(study_area_extent, "EPSG:3857", "EPSG:4326")
+        rect = Rectangle(
+            (minx, miny), maxx - minx, maxy - miny,
+            linewidth=2, edgecolor='red', facecolor='none', linestyle='--', zorder=3
+        )
+        ax.add_patch(rect)
+
+
+def render_district_map(detected_state, covered_districts, study_area_extent=None):
+    return _render_png(draw_district_map, detected_state, covered_districts, study_area_extent)
+
+
+# --- Parallel rendering ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a Streamlit server process with live threads is unsafe
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=OVERVIEW_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def overview_key(detected_state, covered_districts, study_area_extent=None):
+    """Session-level cache key for the three overview maps."""
+    extent = None if study_area_extent is None else [float(v) for v in study_area_extent]
+    return make_key(detected_state, sorted(covered_districts), extent, _source_token(),
+                    data_version(DISTRICT_SHAPEFILE_PATH))
+
+
+@timed("overview.render_overviews")
+def render_overviews(detected_state, covered_districts, study_area_extent=None):
+    """
+    PNG bytes of the India, state and district maps, keyed 'india_map',
+    'state_map' and 'district_map'. Rendered in parallel worker processes;
+    falls back to rendering
+    in-process if the pool is disabled or breaks. The India map is taken from
+    `india_map_cache` when another session already rendered it.
+    """
+    india_key = make_key(detected_state, _source_token())
+    results = {}
+    india_png = india_map_cache.get(india_key)
+    if india_png is not None:
+        results["india_map"] = india_png
+
+    jobs = {
+        "india_map": (india_map_png, detected_state),
+        "state_map": (render_state_map, detected_state, list(covered_districts)),
+        "district_map": (render_district_map, detected_state, list(covered_districts), study_area_extent),
+    }
+    jobs = {name: job for name, job in jobs.items() if name not in results}
+    rendered = None
+    if OVERVIEW_WORKERS > 1:
+        try:
+            pool = _get_pool()
+            futures = {name: pool.submit(*job) for name, job in jobs.items()}
+            rendered = {name: future.result() for name, future in futures.items()}
+        except concurrent.futures.process.BrokenProcessPool as e:
+            logger.warning("Overview render pool failed (%s); rendering in-process", e)
+            _reset_pool()
+    if rendered is None:
+        rendered = {name: fn(*args) for name, (fn, *args) in jobs.items()}
+    results.update(rendered)
+    if "india_map" in rendered:
+        india_map_cache.put(india_key, rendered["india_map"], len(rendered["india_map"]))
+    return {name: results[name] for name in ("india_map", "state_map", "district_map")}
@@ -0,0 +1,161 @@
+# utils/pipeline.py
+#
+# The page 01 -> 02 -> 03 flow as plain functions, for use outside Streamlit
+# (utils/batch.py): read and parse a site table, render the study area map at
+# print resolution, render the three overview maps, and compose the layout.
+
+import os
+import time
+
+from utils.composite import DEFAULT_TEMPLATE, VECTOR_FORMATS, compose_png, compose_vector
+from utils.ingest import detect_columns, ingest_sites, read_header
+from utils.metrics import record
+from utils.overview_maps import (
+    draw_district_map, draw_india_map, draw_state_map, india_map_png, render_district_map, render_state_map,
+)
+from utils.study_area import (
+    DEFAULT_STYLE, FINAL_DPI, detect_admin, draw_study_area, fetch_base_raster, load_north_arrow,
+    project_points, render_study_area_png, study_extent,
+)
+
+FILE_TYPES = ("csv", "xls", "xlsx")
+
+
+class Timer:
+    """Collects named stage durations in seconds; `on_stage(name)` is called as each stage starts."""
+
+    def __init__(self, on_stage=None):
+        self.timings = {}
+        self.on_stage = on_stage
+
+    def __call__(self, stage, fn, *args, **kwargs):
+        if self.on_stage is not None:
+            self.on_stage(stage)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[stage] = round(seconds, 4)
+            record(f"pipeline.{stage}", seconds)
+
+
+# --- Sites ---
+def load_sites(path, site_col=None, lat_col=None, lon_col=None):
+    """
+    Parsed sites of the table at `path`, with columns auto-detected like on
+    page 01 unless given. Raises ValueError if a column is missing or any
+    row's coordinates cannot be parsed.
+    """
+    file_type = os.path.splitext(path)[1].lstrip(".").lower()
+    if file_type not in FILE_TYPES:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    with open(path, "rb") as f:
+        columns = read_header(f, file_type)
+        auto_site, auto_lat, auto_lon = detect_columns(columns)
+        site_col, lat_col, lon_col = site_col or auto_site, lat_col or auto_lat, lon_col or auto_lon
+        for role, col in (("site", site_col), ("latitude", lat_col), ("longitude", lon_col)):
+            if col not in columns:
+                raise ValueError(f"No {role} column found (columns: {', '.join(columns)})")
+        sites, failed, _ = ingest_sites(f, file_type, site_col, lat_col, lon_col)
+    if failed.any():
+        raise ValueError(f"{int(failed.sum())} row(s) have latitude/longitude values that could not be parsed")
+    return sites
+
+
+def study_area_spec(sites, style):
+    """Projected sites, extent and style: what `draw_study_area` needs besides the basemap."""
+    x, y = project_points(sites["lon"].to_numpy(), sites["lat"].to_numpy())
+    extent, pad = study_extent(x, y)
+    return {"x": x, "y": y, "labels": sites["site"].to_numpy(), "extent": extent, "pad": pad, "style": style,
+            "arrow": True}
+
+
+def north_arrow():
+    try:
+        return load_north_arrow()
+    except Exception:
+        return None
+
+
+# --- Panels ---
+def render_panels(spec, admin, base, arrow_img, timer=None):
+    """PNG bytes of the study area map (at FINAL_DPI) and the three overview maps."""
+    timer = timer or Timer()
+    state, covered = admin["detected_state"], admin["covered_districts"]
+    return {
+        "study_area_map": timer("study_area_map", render_study_area_png, spec["x"], spec["y"], spec["labels"],
+                                spec["extent"], spec["pad"], spec["style"], base, arrow_img, dpi=FINAL_DPI),
+        "india_map": timer("india_map", india_map_png, state),
+        "state_map": timer("state_map", render_state_map, state, covered),
+        "district_map": timer("district_map", render_district_map, state, covered, spec["extent"]),
+    }
+
+
+def map_painters(spec, detected_state, covered_districts, base, arrow_img):
+    """Draw calls that recreate the four panels as vectors, for `compose_vector`."""
+    return {
+        "india_map": (draw_india_map, (detected_state,)),
+        "state_map": (draw_state_map, (detected_state, covered_districts)),
+        "district_map": (draw_district_map, (detected_state, covered_districts, spec["extent"])),
+        "study_area_map": (draw_study_area, (spec["x"], spec["y"], spec["labels"], spec["extent"], spec["pad"],
+                                             spec["style"], base, arrow_img)),
+    }
+
+
+# --- Whole project ---
+def project_stages(formats=("png",)):
+    """Stage names `render_project` times, in order."""
+    return ["ingest", "project", "admin", "base", "study_area_map", "india_map", "state_map", "district_map"] + [
+        f"compose_{fmt}" for fmt in formats]
+
+
+def render_project(path, out_dir, style=None, template=DEFAULT_TEMPLATE, formats=("png",), width=None,
+                   width_in=7.2, raster_dpi=FINAL_DPI, columns=(None, None, None), progress=None):
+    """
+    Runs the full flow for one site table and writes `<stem>.<fmt>` for each
+    of `formats` ("png" and/or VECTOR_FORMATS values) to `out_dir`; `width`
+    is the PNG width in pixels, `width_in` the vector width in inches.
+    Returns a report dict with the outputs, detected admin units and stage
+    timings. `progress(stage)` is called as each of `project_stages(formats)`
+    starts.
+    """
+    style = {**DEFAULT_STYLE, **(style or {})}
+    timer = Timer(progress)
+    sites = timer("ingest", load_sites, path, *columns)
+    spec = timer("project", study_area_spec, sites, style)
+    admin = timer("admin", detect_admin, sites["lon"].to_numpy(), sites["lat"].to_numpy())
+    if not admin["detected_state"]:
+        raise ValueError("No sites fall inside a known state")
+    warnings = []
+    try:
+        base = timer("base", fetch_base_raster, spec["extent"], style["basemap"])
+    except Exception as e:
+        base = None
+        warnings.append(f"Failed to load basemap: {e}")
+    arrow_img = north_arrow()
+    panels = render_panels(spec, admin, base, arrow_img, timer)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    outputs = []
+    for fmt in formats:
+        out = os.path.join(out_dir, f"{stem}.{fmt}")
+        if fmt == "png":
+            data = timer("compose_png", compose_png, panels, template, width)
+        elif fmt in VECTOR_FORMATS.values():
+            painters = map_painters(spec, admin["detected_state"], admin["covered_districts"], base, arrow_img)
+            data = timer(f"compose_{fmt}", compose_vector, panels, painters, template, width_in, fmt, raster_dpi)
+        else:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        with open(out, "wb") as f:
+            f.write(data)
+        outputs.append(out)
+    return {
+        "sites": len(sites),
+        "detected_state": admin["detected_state"],
+        "covered_districts": admin["covered_districts"],
+        "outputs": outputs,
+        "warnings": warnings,
+        "timings": timer.timings,
+    }
@@ -0,0 +1,235 @@
+# utils/render_cache.py
+#
+# Byte-bounded LRU caches for rendered map results and intermediate pipeline
+# stages, with hit/miss counters.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import count
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_MAX_MB = float(os.environ.get("PAPERMAP_RENDER_CACHE_MB", 64))
+
+
+def make_key(*parts):
+    """
+    Stable hex digest of `parts`. Bytes and DataFrames/Series are hashed by
+    content; anything else must be JSON-serialisable (dicts are key-sorted).
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray)):
+            h.update(part)
+        elif isinstance(part, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            h.update(repr(list(part.columns) if isinstance(part, pd.DataFrame) else part.name).encode())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_MB * 1e6, name="render"):
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self._bytes -= old_bytes
+                self.evictions += 1
+        logger.debug("%s cache: %s", self.name, self.stats())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{self.name} cache: {s['hits']} hits / {s['misses']} misses · "
+                f"{s['entries']} entries, {s['bytes'] / 1e6:.1f} of {s['max_bytes'] / 1e6:.0f} MB")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def sizeof(value):
+    """Approximate in-memory size of a stage result, for byte budgets."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, dict):
+        return sum(sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(v) for v in value)
+    return 64
+
+
+# One StageCache per session; together they stay within STAGE_CACHE_TOTAL_MB,
+# the least recently used entry of any session going first.
+STAGE_CACHE_SESSION_MB = float(os.environ.get("PAPERMAP_STAGE_CACHE_SESSION_MB", 48))
+STAGE_CACHE_TOTAL_MB = float(os.environ.get("PAPERMAP_STAGE_CACHE_TOTAL_MB", 512))
+
+_stage_lock = threading.RLock()  # guards every StageCache and the total below
+_stage_caches = weakref.WeakSet()
+_stage_bytes = 0
+
+_MISSING = object()  # a stage may legitimately return None
+
+
+class StageCache:
+    """
+    Cached results for the stages of a pipeline, within one byte budget
+    shared by all stages. Each stage is keyed on its own inputs (usually the
+    upstream stage key plus the settings it reads), so changing a setting
+    only reruns the stages downstream of it.
+    """
+
+    def __init__(self, max_bytes=STAGE_CACHE_SESSION_MB * 1e6, name="pipeline"):
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+        self.last_run = {}  # stage -> (hit, seconds) since the last new_run()
+        self._entries = OrderedDict()  # (stage, key) -> (value, nbytes, last used), least recently used first
+        self._bytes = 0
+        with _stage_lock:
+            _stage_caches.add(self)
+
+    def __del__(self):
+        global _stage_bytes
+        with _stage_lock:
+            _stage_bytes -= self._bytes
+
+    def new_run(self):
+        self.last_run = {}
+
+    def _get(self, stage, key):
+        with _stage_lock:
+            entry = self._entries.get((stage, key))
+            if entry is None:
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+                return _MISSING
+            self._entries[(stage, key)] = (entry[0], entry[1], time.monotonic())
+            self._entries.move_to_end((stage, key))
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return entry[0]
+
+    def _put(self, stage, key, value):
+        global _stage_bytes
+        nbytes = sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        with _stage_lock:
+            old = self._entries.pop((stage, key), None)
+            if old is not None:
+                self._drop(old[1])
+            self._entries[(stage, key)] = (value, nbytes, time.monotonic())
+            self._bytes += nbytes
+            _stage_bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._evict_oldest()
+            while _stage_bytes > STAGE_CACHE_TOTAL_MB * 1e6:
+                caches = [cache for cache in _stage_caches if cache._entries]
+                if not caches:  # the total still counts a cache that is being collected
+                    break
+                oldest = min(caches, key=lambda cache: next(iter(cache._entries.values()))[2])
+                oldest._evict_oldest()
+
+    def _drop(self, nbytes):
+        global _stage_bytes
+        self._bytes -= nbytes
+        _stage_bytes -= nbytes
+
+    def _evict_oldest(self):
+        _, (_, nbytes, _) = self._entries.popitem(last=False)
+        self._drop(nbytes)
+        self.evictions += 1
+
+    def run(self, stage, key, fn, *args, **kwargs):
+        start = time.perf_counter()
+        value = self._get(stage, key)
+        hit = value is not _MISSING
+        if not hit:
+            value = fn(*args, **kwargs)
+            self._put(stage, key, value)
+        count(f"{stage}.cache_{'hit' if hit else 'miss'}")
+        self.last_run[stage] = (hit, time.perf_counter() - start)
+        return value
+
+    def peek(self, stage, key):
+        """
+        Cached value for `stage`/`key`, or None; never computes anything, and
+        leaves the hit/miss counters and the LRU order as they are.
+        """
+        with _stage_lock:
+            entry = self._entries.get((stage, key))
+            return None if entry is None else entry[0]
+
+    def stats(self):
+        with _stage_lock:
+            stages = {}
+            for (stage, _), (_, nbytes, _) in self._entries.items():
+                s = stages.setdefault(stage, {"entries": 0, "bytes": 0})
+                s["entries"] += 1
+                s["bytes"] += nbytes
+            for stage in set(self.hits) | set(self.misses):
+                s = stages.setdefault(stage, {"entries": 0, "bytes": 0})
+                s.update(hits=self.hits.get(stage, 0), misses=self.misses.get(stage, 0))
+            return stages
+
+    def summary(self, name=None):
+        runs = " · ".join(
+            f"{stage} {'cached' if hit else f'{seconds * 1000:.0f} ms'}"
+            for stage, (hit, seconds) in self.last_run.items()
+        )
+        return (f"{name or self.name}: {runs} ({self._bytes / 1e6:.1f} of {self.max_bytes / 1e6:.0f} MB cached"
+                f" · all sessions {_stage_bytes / 1e6:.0f} of {STAGE_CACHE_TOTAL_MB:.0f} MB)")
@@ -0,0 +1,45 @@
+# utils/sessions.py
+#
+# The id that keys a session's server-side data (rendered maps in the
+# artifact store, batch jobs), and notice of when the session has ended.
+# Streamlit has no session-end callback, but it discards a session's
+# st.session_state a short while after the browser tab closes; a marker
+# object kept in it is finalised then and reports the session id. Stores
+# subscribe with `ended_sessions()` and drop the reported sessions on their
+# next call, outside their own locks (a finaliser can run in the middle of
+# any allocation, including one made while such a lock is held).
+
+import threading
+import uuid
+import weakref
+from collections import deque
+
+_subscribers = []  # one deque of ended session ids per store
+_subscribers_lock = threading.Lock()
+
+
+class _SessionMarker:
+    pass
+
+
+def _session_ended(session_id):
+    # deque.append is atomic: no lock may be taken in a finaliser
+    for ended in list(_subscribers):
+        ended.append(session_id)
+
+
+def get_session_id(session_state):
+    """This session's id, created on first use together with its end-of-session marker."""
+    session_id = session_state.setdefault('session_id', uuid.uuid4().hex)
+    if '_session_marker' not in session_state:
+        marker = session_state['_session_marker'] = _SessionMarker()
+        weakref.finalize(marker, _session_ended, session_id)
+    return session_id
+
+
+def ended_sessions():
+    """A deque that receives the id of every session that ends from now on; the caller pops them."""
+    ended = deque()
+    with _subscribers_lock:
+        _subscribers.append(ended)
+    return ended
@@ -0,0 +1,184 @@
+# utils/study_area.py
+#
+# The study area map pipeline behind page 01, split into stages that can be
+# cached independently:
+#   header -> ingest + parse (utils/ingest.py) -> project -> admin -> base raster
+#   -> render (overlay + encode)
+
+import functools
+import io
+
+import matplotlib.image as mpimg
+import numpy as np
+from matplotlib.offsetbox import AnnotationBbox, OffsetImage
+
+from utils.admin_lookup import lookup_admin
+from utils.aggregate import aggregate_points, count_marker_sizes, data_per_point
+from utils.boundary_store import get_districts
+from utils.figures import subplots
+from utils.geo_utils import add_map_border, add_scalebar, graticule_ticks, lat_labels, lon_labels, project_xy
+from utils.labels import MAX_LABELS, draw_labels
+from utils.metrics import timed
+from utils.tile_cache import BASEMAP_OPTIONS, draw_mosaic, fetch_mosaic
+
+NORTH_ARROW_PATH = "assets/north_arrow.png"
+EXTENT_PADDING = 0.15
+
+# Preview renders at screen resolution over one zoom level coarser tiles;
+# "Render final" redraws once at print resolution over the full-zoom basemap.
+PREVIEW_DPI = 100
+PREVIEW_ZOOM_ADJUST = -1
+FINAL_DPI = 300
+
+DEFAULT_STYLE = {
+    "basemap": "OpenStreetMap",
+    "scalebar_unit": "kilometers",
+    "scalebar_length": 1.0,
+    "scalebar_offset_x": 0.75,
+    "scalebar_offset_y": 0.05,
+    "label_fontsize": 9,
+    "label_color": "#000000",
+    "label_weight": "normal",
+    "label_offset_x": 0,
+    "label_offset_y": 0,
+    "label_bg_enabled": False,
+    "label_bg_color": "#ffffff",
+    "label_thinning": False,
+    "label_max": MAX_LABELS,
+    "marker_color": "#ff0000",
+    "marker_size": 50,
+    "marker_shape": "o",
+    "aggregate": None,
+    "aggregate_cell": 20,
+    "arrow_offset_x": 0.92,
+    "arrow_offset_y": 0.92,
+    "arrow_zoom": 0.06,
+}
+
+
+# --- Stage: project ---
+def project_points(lon, lat):
+    """Web Mercator x, y arrays for lon/lat arrays."""
+    return project_xy(lon, lat, "EPSG:4326", "EPSG:3857")
+
+
+def study_extent(x, y, padding=EXTENT_PADDING):
+    """Padded [minx, miny, maxx, maxy] around the projected sites, plus the (pad_x, pad_y) used."""
+    minx, miny, maxx, maxy = float(x.min()), float(y.min()), float(x.max()), float(y.max())
+    pad_x = (maxx - minx) * padding
+    pad_y = (maxy - miny) * padding
+    return [minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y], (pad_x, pad_y)
+
+
+# --- Stage: admin detection ---
+def detect_admin(lon, lat):
+    admin = lookup_admin(lon, lat)
+    most_common_state = admin['State_Name'].mode().iloc[0] if not admin['State_Name'].isnull().all() else ""
+    unique_districts = admin['District'].dropna().unique().tolist()
+    districts_gdf = get_districts()
+    district_bounds = districts_gdf[districts_gdf['District'].isin(unique_districts)].total_bounds
+    return {
+        "detected_state": most_common_state,
+        "covered_districts": unique_districts,
+        "district_bounds_extent": district_bounds.tolist(),
+    }
+
+
+# --- Stage: base raster ---
+def fetch_base_raster(extent, basemap, zoom_adjust=0):
+    """Tile mosaic for the extent; raises if no tiles could be loaded."""
+    return fetch_mosaic(extent, BASEMAP_OPTIONS[basemap], zoom_adjust=zoom_adjust)
+
+
+# --- Stage: overlay + encode ---
+@functools.lru_cache(maxsize=1)
+def load_north_arrow():
+    return mpimg.imread(NORTH_ARROW_PATH)
+
+
+def add_study_area_ticks(ax, extent):
+    xtick_x, lon_ticks, ytick_y, lat_ticks = graticule_ticks(extent, "EPSG:3857")
+    xtick_labels, ytick_labels = lon_labels(lon_ticks), lat_labels(lat_ticks)
+
+    # 1. Set bottom and left (primary axes)
+    ax.set_xticks(xtick_x)
+    ax.set_xticklabels(xtick_labels, fontsize=10)
+    ax.set_yticks(ytick_y)
+    ax.set_yticklabels(ytick_labels, fontsize=10)
+    ax.set_xlabel("Longitude", fontsize=12, labelpad=10)
+    ax.set_ylabel("Latitude", fontsize=12, labelpad=10)
+
+    # 2. Top longitude labels
+    ax_top = ax.secondary_xaxis('top')
+    ax_top.set_xticks(xtick_x)
+    ax_top.set_xticklabels(xtick_labels, fontsize=10)
+
+    # 3. Right latitude labels
+    ax_right = ax.secondary_yaxis('right')
+    ax_right.set_yticks(ytick_y)
+    ax_right.set_yticklabels(ytick_labels, fontsize=10)
+
+    # Make all tick marks point out and set size
+    ax.tick_params(axis='both', which='both', direction='out', length=6, top=True, right=True)
+    ax_top.tick_params(axis='x', direction='out', length=6)
+    ax_right.tick_params(axis='y', direction='out', length=6)
+
+
+def draw_study_area(ax, x, y, labels, extent, pad, style, base=None, arrow_img=None):
+    """
+    Draws markers, labels, basemap, scale bar, north arrow and border onto
+    `ax`. Returns the number of labels hidden by label thinning.
+    """
+    ax.set_aspect('equal')
+    ax.set_xlim(extent[0], extent[2])
+    ax.set_ylim(extent[1], extent[3])
+    add_study_area_ticks(ax, extent)
+
+    # Dense sites: one marker per bin, sized by count and labelled with it
+    sizes = style["marker_size"]
+    if style["aggregate"]:
+        cx, cy, counts, first = aggregate_points(x, y, style["aggregate"],
+                                                 style["aggregate_cell"] * data_per_point(ax))
+        labels = np.where(counts > 1, counts.astype(str), np.asarray(labels, dtype=object)[first])
+        x, y = cx, cy
+        sizes = count_marker_sizes(counts, style["marker_size"])
+    ax.scatter(x, y, color=style["marker_color"], edgecolor='black',
+               s=sizes, marker=style["marker_shape"])
+
+    pad_x, pad_y = pad
+    dx = style["label_offset_x"] * pad_x / 100
+    dy = style["label_offset_y"] * pad_y / 100
+    hidden_labels = draw_labels(ax, x + dx, y + dy, labels,
+                                fontsize=style["label_fontsize"], color=style["label_color"],
+                                weight=style["label_weight"],
+                                bg_color=style["label_bg_color"] if style["label_bg_enabled"] else None,
+                                thin=style["label_thinning"], max_labels=style["label_max"])
+
+    if base is not None:
+        image, image_extent = base
+        draw_mosaic(ax, image, image_extent, BASEMAP_OPTIONS[style["basemap"]])
+
+    add_scalebar(ax, style["scalebar_length"], style["scalebar_unit"],
+                 offset_x=style["scalebar_offset_x"], offset_y=style["scalebar_offset_y"])
+    if arrow_img is not None:
+        imagebox = OffsetImage(arrow_img, zoom=style["arrow_zoom"])
+        ab = AnnotationBbox(imagebox, (style["arrow_offset_x"], style["arrow_offset_y"]),
+                            xycoords='axes fraction', frameon=False)
+        ax.add_artist(ab)
+    add_map_border(ax)
+    return hidden_labels
+
+
+def render_study_area(x, y, labels, extent, pad, style, base=None, arrow_img=None, dpi=FINAL_DPI):
+    """(PNG bytes, number of labels hidden by thinning)."""
+    with subplots((10, 10), dpi, reuse=True) as (fig, ax):
+        with timed("study_area.draw"):
+            hidden_labels = draw_study_area(ax, x, y, labels, extent, pad, style, base, arrow_img)
+        buf = io.BytesIO()
+        with timed("study_area.savefig"):
+            fig.savefig(buf, format="png", dpi=dpi, bbox_inches='tight')
+    return buf.getvalue(), hidden_labels
+
+
+def render_study_area_png(x, y, labels, extent, pad, style, base=None, arrow_img=None, dpi=FINAL_DPI):
+    return render_study_area(x, y, labels, extent, pad, style, base, arrow_img, dpi)[0]
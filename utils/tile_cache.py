@@ -0,0 +1,349 @@
+# utils/tile_cache.py
+#
+# On-disk XYZ tile cache for the study area basemaps. Tiles are stored as
+# <cache dir>/<provider>/<z>/<x>/<y>, evicted least-recently-used once the
+# cache grows past its byte budget, and never fetched over the network when
+# offline mode is on (air-gapped deployments serve prefetched tiles only).
+#
+# Prefetch tiles for a bounding box (lon/lat) and zoom range:
+#   python -m utils.tile_cache prefetch --provider all --bbox 68 6 98 38 --zoom 3 7
+#   python -m utils.tile_cache stats
+#
+# Configuration (environment):
+#   PAPERMAP_TILE_CACHE      cache directory (default ~/.cache/papermap/tiles)
+#   PAPERMAP_TILE_CACHE_MB   size budget in MB (default 1024)
+#   PAPERMAP_TILES_OFFLINE   "1" to serve cached tiles only
+
+import argparse
+import io
+import logging
+import math
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import contextily as ctx
+import numpy as np
+from matplotlib import patheffects
+from PIL import Image
+
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+BASEMAP_OPTIONS = {
+    "OpenStreetMap": ctx.providers.OpenStreetMap.Mapnik,
+    "CartoDB Positron": ctx.providers.CartoDB.Positron,
+    "Esri World Topo": ctx.providers.Esri.WorldTopoMap,
+    "Esri Standard Streets": ctx.providers.Esri.WorldStreetMap
+}
+
+TILE_CACHE_DIR = os.environ.get(
+    "PAPERMAP_TILE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "papermap", "tiles")
+)
+TILE_CACHE_MAX_MB = float(os.environ.get("PAPERMAP_TILE_CACHE_MB", 1024))
+TILES_OFFLINE = os.environ.get("PAPERMAP_TILES_OFFLINE", "").lower() in ("1", "true", "yes")
+
+EARTH_RADIUS = 6378137.0
+WEB_MERCATOR_HALF = math.pi * EARTH_RADIUS  # 20037508.34...
+USER_AGENT = "PaperMap tile cache"
+
+
+class TileUnavailableError(RuntimeError):
+    pass
+
+
+# --- Tile math (EPSG:3857) ---
+def tile_span(z):
+    return 2 * WEB_MERCATOR_HALF / 2 ** z
+
+
+def tile_range(extent, z):
+    """Inclusive x/y tile index ranges covering a (minx, miny, maxx, maxy) 3857 extent."""
+    minx, miny, maxx, maxy = extent
+    span = tile_span(z)
+    last = 2 ** z - 1
+
+    def clamp(v):
+        return min(max(int(math.floor(v)), 0), last)
+
+    x0, x1 = clamp((minx + WEB_MERCATOR_HALF) / span), clamp((maxx + WEB_MERCATOR_HALF) / span)
+    y0, y1 = clamp((WEB_MERCATOR_HALF - maxy) / span), clamp((WEB_MERCATOR_HALF - miny) / span)
+    return x0, x1, y0, y1
+
+
+def lonlat_to_mercator(lon, lat):
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = math.radians(lon) * EARTH_RADIUS
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def mercator_to_lonlat(x, y):
+    return math.degrees(x / EARTH_RADIUS), math.degrees(math.atan(math.sinh(y / EARTH_RADIUS)))
+
+
+def auto_zoom(extent, provider, zoom_adjust=0):
+    # Same rule as contextily's "auto" zoom, evaluated on the lon/lat extent.
+    w, s = mercator_to_lonlat(extent[0], extent[1])
+    e, n = mercator_to_lonlat(extent[2], extent[3])
+    zoom_lon = math.ceil(math.log2(360 * 2.0 / max(e - w, 1e-9)))
+    zoom_lat = math.ceil(math.log2(360 * 2.0 / max(n - s, 1e-9)))
+    zoom = min(zoom_lon, zoom_lat) + zoom_adjust
+    return max(min(zoom, provider.get("max_zoom", 19)), provider.get("min_zoom", 0))
+
+
+# --- Cache ---
+class TileCache:
+    def __init__(self, root=TILE_CACHE_DIR, max_bytes=TILE_CACHE_MAX_MB * 1e6, offline=TILES_OFFLINE,
+                 timeout=10, fetch_workers=8):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.offline = offline
+        self.timeout = timeout
+        self.fetch_workers = fetch_workers
+        self.hits = self.misses = self.fetches = self.failures = self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> size, least recently used first
+        self._bytes = 0
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._bytes += size
+
+    def tile_path(self, provider, z, x, y):
+        key = provider.name.replace("/", "_").replace(" ", "_")
+        return os.path.join(self.root, key, str(z), str(x), str(y))
+
+    def _touch(self, path):
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _store(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    @timed("tiles.download")
+    def _download(self, url):
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def get(self, provider, z, x, y):
+        """Tile bytes from disk, fetched and stored on a miss; None if unavailable."""
+        path = self.tile_path(provider, z, x, y)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            self._touch(path)
+            with self._lock:
+                self.hits += 1
+            return data
+        except OSError:
+            pass
+
+        with self._lock:
+            self.misses += 1
+        if self.offline:
+            return None
+        try:
+            data = self._download(provider.build_url(x=x, y=y, z=z))
+            # Servers answer some errors with status 200 and an HTML/JSON
+            # page; cached, offline mode would serve it forever
+            Image.open(io.BytesIO(data)).verify()
+        except Exception as e:
+            logger.warning("Tile fetch failed for %s z=%d x=%d y=%d: %s", provider.name, z, x, y, e)
+            with self._lock:
+                self.failures += 1
+            return None
+        with self._lock:
+            self.fetches += 1
+        self._store(path, data)
+        return data
+
+    def get_many(self, provider, tiles):
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            return list(pool.map(lambda t: self.get(provider, *t), tiles))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "tiles": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "offline": self.offline,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fetches": self.fetches,
+                "failures": self.failures,
+                "evictions": self.evictions,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_tile_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TileCache()
+        return _default_cache
+
+
+# --- Mosaic & plotting ---
+@timed("tiles.fetch_mosaic")
+def fetch_mosaic(extent, provider, zoom="auto", zoom_adjust=0, cache=None):
+    """
+    Stitches the tiles covering a 3857 `extent` into one RGBA array.
+    Returns `(image, (left, right, bottom, top))` for `ax.imshow(extent=...)`.
+    Missing tiles stay transparent; raises TileUnavailableError if none load.
+    """
+    cache = cache or get_tile_cache()
+    z = auto_zoom(extent, provider, zoom_adjust) if zoom == "auto" else int(zoom)
+    x0, x1, y0, y1 = tile_range(extent, z)
+    tiles = [(z, x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+    blobs = cache.get_many(provider, tiles)
+    if not any(blobs):
+        mode = "offline cache" if cache.offline else "tile server"
+        raise TileUnavailableError(f"No {provider.name} tiles available from the {mode} at zoom {z}")
+
+    size = None
+    decoded = []
+    for blob in blobs:
+        if blob is None:
+            decoded.append(None)
+            continue
+        tile = np.asarray(Image.open(io.BytesIO(blob)).convert("RGBA"))
+        size = size or tile.shape[0]
+        decoded.append(tile)
+
+    cols = x1 - x0 + 1
+    image = np.zeros(((y1 - y0 + 1) * size, cols * size, 4), dtype=np.uint8)
+    for i, tile in enumerate(decoded):
+        if tile is None:
+            continue
+        if tile.shape[0] != size:
+            tile = np.asarray(Image.fromarray(tile).resize((size, size)))
+        row, col = divmod(i, cols)
+        image[row * size:(row + 1) * size, col * size:(col + 1) * size] = tile
+
+    span = tile_span(z)
+    left = -WEB_MERCATOR_HALF + x0 * span
+    right = -WEB_MERCATOR_HALF + (x1 + 1) * span
+    top = WEB_MERCATOR_HALF - y0 * span
+    bottom = WEB_MERCATOR_HALF - (y1 + 1) * span
+    return image, (left, right, bottom, top)
+
+
+def add_attribution(ax, text, font_size=8):
+    """
+    Same text as `ctx.add_attribution`, without its `pyplot.draw()`: that
+    draws pyplot's current figure, creating one in the global registry if
+    none exists, rather than the figure `ax` belongs to.
+    """
+    return ax.text(0.005, 0.005, text, transform=ax.transAxes, size=font_size,
+                   path_effects=[patheffects.withStroke(linewidth=2, foreground="w")], wrap=True)
+
+
+def draw_mosaic(ax, image, extent, provider, attribution=True, interpolation="bilinear"):
+    """Draws a `fetch_mosaic` result under the existing artists, keeping the axis limits."""
+    xmin, xmax, ymin, ymax = ax.axis()
+    ax.imshow(image, extent=extent, interpolation=interpolation, aspect=ax.get_aspect())
+    ax.axis((xmin, xmax, ymin, ymax))
+    if attribution and provider.get("attribution"):
+        add_attribution(ax, provider["attribution"])
+
+
+def add_basemap(ax, provider, zoom="auto", zoom_adjust=0, cache=None, attribution=True,
+                interpolation="bilinear"):
+    """Drop-in for `ctx.add_basemap` on EPSG:3857 axes, served through the tile cache."""
+    xmin, xmax, ymin, ymax = ax.axis()
+    image, extent = fetch_mosaic((xmin, ymin, xmax, ymax), provider, zoom, zoom_adjust, cache)
+    draw_mosaic(ax, image, extent, provider, attribution, interpolation)
+
+
+# --- Prefetch CLI ---
+def prefetch(provider, bbox, zooms, cache=None, max_tiles=5000):
+    """Downloads every tile covering a lon/lat `bbox` (w, s, e, n) for each zoom in `zooms`."""
+    cache = cache or get_tile_cache()
+    minx, miny = lonlat_to_mercator(bbox[0], bbox[1])
+    maxx, maxy = lonlat_to_mercator(bbox[2], bbox[3])
+    tiles = []
+    for z in zooms:
+        x0, x1, y0, y1 = tile_range((minx, miny, maxx, maxy), z)
+        tiles.extend((z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+    if len(tiles) > max_tiles:
+        raise ValueError(f"{len(tiles)} tiles requested for {provider.name}; raise --max-tiles to allow this")
+    blobs = cache.get_many(provider, tiles)
+    return len(tiles), sum(blob is not None for blob in blobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.tile_cache")
+    parser.add_argument("--cache-dir", default=TILE_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=TILE_CACHE_MAX_MB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pre = sub.add_parser("prefetch", help="download tiles for a bounding box and zoom range")
+    pre.add_argument("--provider", default="all", choices=["all"] + list(BASEMAP_OPTIONS))
+    pre.add_argument("--bbox", nargs=4, type=float, required=True, metavar=("W", "S", "E", "N"))
+    pre.add_argument("--zoom", nargs=2, type=int, required=True, metavar=("MIN", "MAX"))
+    pre.add_argument("--max-tiles", type=int, default=5000,
+                     help="refuse larger jobs (public tile servers limit bulk downloads)")
+    sub.add_parser("stats", help="print cache size and counters")
+
+    args = parser.parse_args(argv)
+    cache = TileCache(args.cache_dir, args.max_mb * 1e6, offline=False)
+
+    if args.command == "stats":
+        for key, value in cache.stats().items():
+            print(f"{key}: {value}")
+        return
+
+    names = list(BASEMAP_OPTIONS) if args.provider == "all" else [args.provider]
+    zooms = range(args.zoom[0], args.zoom[1] + 1)
+    for name in names:
+        requested, stored = prefetch(BASEMAP_OPTIONS[name], args.bbox, zooms, cache, args.max_tiles)
+        print(f"{name}: {stored}/{requested} tiles cached")
+    print(f"cache: {cache.stats()['bytes'] / 1e6:.1f} MB in {cache.root}")
+
+
+if __name__ == "__main__":
+    main()